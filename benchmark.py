@@ -0,0 +1,282 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import main
+
+# Yerel taklit sunucuların ayarları; komut satırından değiştirilir
+FAKE_CONFIG = {
+    "llm_latency": 0.2,
+    "embed_latency": 0.05,
+    "source_latency": 0.1,
+    "response_chars": 1500,
+    "embedding_dim": 1024,
+    "source_results": 5,
+}
+
+# Taklit Ollama'nın bellekte tuttuğu modeller (/api/ps)
+loaded_models = set()
+
+request_counts = defaultdict(int)
+request_counts_lock = threading.Lock()
+
+def count_request(name):
+    with request_counts_lock:
+        request_counts[name] += 1
+
+def fake_generation(prompt):
+    seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    filler = (f"Lorem ipsum {seed[:8]} dolor sit amet. " * (FAKE_CONFIG["response_chars"] // 30 + 1))[:FAKE_CONFIG["response_chars"]]
+    if "TITLE:" in prompt and "CONTENT:" in prompt:
+        return f"TITLE: Unexpected Aspect {seed[:4]}\nCONTENT: {filler}"
+    if "[[Concept1]]" in prompt:
+        return f"[[Topic {seed[:4]}]] [[Topic {seed[4:8]}]] [[Topic {seed[8:12]}]]\nSelected concept: Topic {seed[4:8]}"
+    if "filename" in prompt.lower():
+        return f"note_{seed[:8]}"
+    if "Wikipedia article titles" in prompt:
+        return "\n".join(f"Article {seed[i:i + 4]}" for i in range(0, 20, 4))
+    if "synonyms" in prompt:
+        return "\n".join(f"Alias {seed[i:i + 4]}" for i in range(0, 16, 4))
+    return filler
+
+def fake_embedding(text):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    dim = FAKE_CONFIG["embedding_dim"]
+    return [digest[i % len(digest)] / 255 - 0.5 for i in range(dim)]
+
+def fake_arxiv_feed(search_query, max_results):
+    # OR ile birleştirilmiş her konu için ayrı kayıtlar; ID'ler konudan türetilir
+    entries = []
+    for clause in search_query.split(" OR "):
+        terms = re.findall(r'all:(\w+)', clause)
+        base = int(hashlib.sha256(" ".join(terms).encode("utf-8")).hexdigest()[:4], 16) % 10000
+        for i in range(FAKE_CONFIG["source_results"]):
+            entries.append(f"""<entry>
+<id>http://arxiv.org/abs/{base:04d}.{i:05d}v1</id>
+<updated>2024-01-01T00:00:00Z</updated>
+<published>2024-01-01T00:00:00Z</published>
+<title>{" ".join(terms).title()} paper {i}</title>
+<summary>{"Abstract text about the topic. " * 20}</summary>
+<author><name>Author {i}</name></author>
+<link href="http://arxiv.org/abs/{base:04d}.{i:05d}v1" rel="alternate" type="text/html"/>
+<arxiv:primary_category xmlns:arxiv="http://arxiv.org/schemas/atom" term="cs.AI" scheme="http://arxiv.org/schemas/atom"/>
+<category term="cs.AI" scheme="http://arxiv.org/schemas/atom"/>
+</entry>""")
+    entries = entries[:max_results]
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">
+<title>arXiv Query</title>
+<id>http://arxiv.org/api/fake</id>
+<updated>2024-01-01T00:00:00Z</updated>
+<opensearch:totalResults>{len(entries)}</opensearch:totalResults>
+<opensearch:startIndex>0</opensearch:startIndex>
+<opensearch:itemsPerPage>{len(entries)}</opensearch:itemsPerPage>
+{"".join(entries)}
+</feed>"""
+
+def fake_google_html(query):
+    results = "".join(f'<div class="g"><h3>{query} result {i}</h3><span>{"Search snippet text. " * 15}</span></div>'
+                      for i in range(FAKE_CONFIG["source_results"]))
+    return f"<html><body>{results}</body></html>"
+
+def fake_wikipedia(lang, params):
+    if params.get("list") == "search":
+        query = params["srsearch"]
+        return {"query": {"search": [{"title": query.title(), "snippet": f"{query} snippet"}]}}
+    pages = []
+    for title in params.get("titles", "").split("|"):
+        langlinks = [{"lang": other, "title": f"{title} ({other})"}
+                     for other in main.WIKIPEDIA_LANGUAGES if other != lang] if lang == main.WIKIPEDIA_LANGUAGES[0] else []
+        pages.append({"title": title, "extract": f"{title} intro extract. " * 10, "langlinks": langlinks})
+    return {"query": {"pages": pages}}
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if "model" in body:
+            loaded_models.add(body["model"] if ":" in body["model"] else body["model"] + ":latest")
+        if self.path == "/api/generate" and "prompt" not in body:
+            count_request("ollama.load")
+            self.reply(json.dumps({"model": body["model"], "response": "", "done": True, "done_reason": "load"}))
+        elif self.path == "/api/generate":
+            count_request("ollama.generate")
+            time.sleep(FAKE_CONFIG["llm_latency"])
+            text = fake_generation(body.get("prompt", ""))
+            if isinstance(body.get("format"), dict):
+                # Şemalı istekler için her metin alanı doldurulur
+                text = json.dumps({name: text if name != "unique_title" else "Unexpected Aspect"
+                                   for name in body["format"].get("properties", {})})
+            metrics = {"done": True, "total_duration": int(FAKE_CONFIG["llm_latency"] * 1e9), "load_duration": 0,
+                       "prompt_eval_count": main.estimate_tokens(body.get("prompt", "")), "prompt_eval_duration": 0,
+                       "eval_count": main.estimate_tokens(text), "eval_duration": int(FAKE_CONFIG["llm_latency"] * 1e9)}
+            if body.get("stream"):
+                lines = [json.dumps({"response": word + " ", "done": False}) for word in text.split(" ")]
+                lines.append(json.dumps({"response": "", **metrics}))
+                self.reply("\n".join(lines) + "\n", "application/x-ndjson")
+            else:
+                self.reply(json.dumps({"response": text, **metrics}))
+        elif self.path == "/api/embed":
+            count_request("ollama.embed")
+            time.sleep(FAKE_CONFIG["embed_latency"])
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            self.reply(json.dumps({"embeddings": [fake_embedding(text) for text in inputs]}))
+        elif self.path == "/api/embeddings":
+            count_request("ollama.embeddings")
+            time.sleep(FAKE_CONFIG["embed_latency"])
+            self.reply(json.dumps({"embedding": fake_embedding(body["prompt"])}))
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        if url.path == "/api/ps":
+            count_request("ollama.ps")
+            self.reply(json.dumps({"models": [{"name": model, "model": model} for model in sorted(loaded_models)]}))
+            return
+        time.sleep(FAKE_CONFIG["source_latency"])
+        if parts[0] == "google":
+            count_request("google")
+            self.reply(fake_google_html(params.get("q", "")), "text/html")
+        elif parts[0] == "arxiv":
+            count_request("arxiv")
+            self.reply(fake_arxiv_feed(params.get("search_query", ""), int(params.get("max_results", 10))), "application/atom+xml")
+        elif parts[0] == "wiki":
+            count_request(f"wikipedia.{parts[1]}")
+            self.reply(json.dumps(fake_wikipedia(parts[1], params)))
+        else:
+            self.send_error(404)
+
+def start_fake_servers():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    main.OLLAMA_URL = base
+    main.GOOGLE_SEARCH_URL = base + "/google/search?q={query}"
+    main.ARXIV_API_URL = base + "/arxiv/query?{}"
+    main.WIKIPEDIA_API_URL = base + "/wiki/{lang}/w/api.php"
+    # Taklit sunucuda arXiv kullanım sınırı yok
+    main.arxiv_client.min_interval = 0
+    return server
+
+stage_times = defaultdict(list)
+stage_times_lock = threading.Lock()
+
+def timed_stage(name, fn):
+    def run(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with stage_times_lock:
+                stage_times[name].append(time.perf_counter() - start)
+    return run
+
+def instrument_pipeline():
+    # main modülündeki aşama fonksiyonlarını süre ölçen sarmalayıcılarla değiştir
+    stages = {
+        "sources": "gather_sources",
+        "llm.generate": "chat_with_llm",
+        "condense": "condense_context",
+        "embedding": "generate_embeddings_ollama",
+        "note": "create_markdown_file",
+        "concepts": "extract_relevant_words",
+        "topic": "research_and_expand",
+    }
+    for stage, attr in stages.items():
+        setattr(main, attr, timed_stage(stage, getattr(main, attr)))
+
+def run_benchmark(seed, iterations, workers):
+    main.current_query = seed
+    main.iteration = 0
+    frontier = main.ResearchFrontier(main.topic_index)
+    frontier.push(seed, 0)
+    tracemalloc.start()
+    start = time.perf_counter()
+    main.crawl_frontier(frontier, iterations, workers)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "iterations": main.iteration,
+        "workers": workers,
+        "end_to_end_seconds": round(elapsed, 3),
+        "seconds_per_note": round(elapsed / max(main.iteration, 1), 3),
+        "stages": {name: {"calls": len(times), "total_seconds": round(sum(times), 3),
+                          "mean_seconds": round(sum(times) / len(times), 3)}
+                   for name, times in sorted(stage_times.items())},
+        "requests": dict(sorted(request_counts.items())),
+        "peak_python_memory_mb": round(peak / 1024 / 1024, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def print_report(report):
+    print(f"\nNotes: {report['iterations']} (workers: {report['workers']})")
+    print(f"End-to-end: {report['end_to_end_seconds']:.2f}s ({report['seconds_per_note']:.2f}s per note)")
+    print("\nStage                 calls     total      mean")
+    for name, stats in report["stages"].items():
+        print(f"{name:<20} {stats['calls']:>6} {stats['total_seconds']:>9.2f} {stats['mean_seconds']:>9.3f}")
+    print("\nRequests:")
+    for name, count in report["requests"].items():
+        print(f"  {name}: {count}")
+    print(f"\nPeak Python memory: {report['peak_python_memory_mb']} MB, max RSS: {report['max_rss_mb']} MB")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline CogniChain benchmark with local stand-ins for Ollama and the sources.")
+    parser.add_argument("--topic", default="Quantum Entanglement")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=main.FRONTIER_WORKERS)
+    parser.add_argument("--llm-latency", type=float, default=FAKE_CONFIG["llm_latency"], help="seconds per generation")
+    parser.add_argument("--embed-latency", type=float, default=FAKE_CONFIG["embed_latency"], help="seconds per embedding request")
+    parser.add_argument("--source-latency", type=float, default=FAKE_CONFIG["source_latency"], help="seconds per source request")
+    parser.add_argument("--response-chars", type=int, default=FAKE_CONFIG["response_chars"], help="characters per generation")
+    parser.add_argument("--embedding-dim", type=int, default=FAKE_CONFIG["embedding_dim"])
+    parser.add_argument("--source-results", type=int, default=FAKE_CONFIG["source_results"], help="results per Google/arXiv query")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    return parser.parse_args()
+
+def run():
+    args = parse_args()
+    json_path = os.path.abspath(args.json) if args.json else None
+    for key in FAKE_CONFIG:
+        FAKE_CONFIG[key] = getattr(args, key)
+
+    # Not, önbellek ve vektör dosyaları geçici bir dizine yazılır; her çalıştırma soğuk başlar
+    workdir = tempfile.mkdtemp(prefix="cognichain_bench_")
+    os.chdir(workdir)
+    start_fake_servers()
+    instrument_pipeline()
+    report = run_benchmark(args.topic, args.iterations, args.workers)
+    report["workdir"] = workdir
+    print_report(report)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -1,79 +1,849 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import json
 import os
 from datetime import datetime
 import re
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import chromadb
-from chromadb.config import Settings
 import signal
 import sys
-import arxiv
-from urllib.parse import quote
+import asyncio
+import threading
+import time
+import random
+import hashlib
+import sqlite3
+import base64
+import shutil
+import heapq
+import argparse
+from functools import lru_cache
+from contextlib import contextmanager
+from urllib.parse import quote, urlparse, urlencode
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 OLLAMA_URL = "http://192.168.1.74:11434"  # Replace this with your remote server's IP
 
 # ChromaDB için kalıcı depolama dizini belirle
 CHROMA_PERSIST_DIRECTORY = "./chroma_db"
 
-# Dizinin var olduğundan emin ol
-os.makedirs(CHROMA_PERSIST_DIRECTORY, exist_ok=True)
-
-# Chroma client'ı başlat
-client = chromadb.Client(Settings(
-    persist_directory=CHROMA_PERSIST_DIRECTORY,
-    is_persistent=True
-))
+# Vektör deposu: "chroma" veya yerleşik "numpy" (memory-mapped float32 matris + metadata dosyası)
+VECTOR_BACKEND = "chroma"
+VECTOR_STORE_DIRECTORY = "./vector_store"
+
+class NumpyVectorStore:
+    # Chroma koleksiyonunun kullandığımız alt kümesi: add, upsert, delete, query, get, count
+    metadata = {"hnsw:space": "cosine"}
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.metadata_path = os.path.join(directory, "metadata.jsonl")
+        self.documents_path = os.path.join(directory, "documents.txt")
+        self.lock = threading.Lock()
+        self.dim = None
+        self.rows = []      # satır başına {"id", "metadata", "doc_offset", "doc_length"}
+        self.row_of = {}    # id -> geçerli satır
+        self.live = np.zeros(0, dtype=bool)
+        self.matrix = None
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def load(self):
+        ends = []   # her geçerli metadata satırının dosyadaki bitiş konumu
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        self.rows.append(json.loads(line))
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        break
+                    ends.append(f.tell())
+        if self.rows:
+            self.dim = self.rows[0]["dim"]
+            # Yarım kalmış yazımlarda vektör ve metadata sayısı farklı olabilir; kısa olana göre kes
+            vector_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+            count = min(len(self.rows), vector_size // (self.dim * 4))
+            self.rows = self.rows[:count]
+            ends = ends[:count]
+        # Son geçerli kayıttan sonrası atılır; yeni eklemeler doğru satır/vektör hizasından başlar
+        self.truncate(self.metadata_path, ends[-1] if ends else 0)
+        self.truncate(self.vectors_path, len(self.rows) * (self.dim or 0) * 4)
+        self.truncate(self.documents_path, max((row["doc_offset"] + row["doc_length"] for row in self.rows), default=0))
+        self.live = np.ones(len(self.rows), dtype=bool)
+        for index, row in enumerate(self.rows):
+            if row["id"] in self.row_of:
+                self.live[self.row_of[row["id"]]] = False
+            self.row_of[row["id"]] = index
+            if row["metadata"].get("deleted"):
+                self.live[index] = False
+                del self.row_of[row["id"]]
+        self.matrix = None
+
+    @staticmethod
+    def truncate(path, size):
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    def vectors(self):
+        if self.matrix is None or len(self.matrix) != len(self.rows):
+            self.matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                    shape=(len(self.rows), self.dim)) if self.rows else np.zeros((0, 0), dtype=np.float32)
+        return self.matrix
+
+    def count(self):
+        return int(self.live.sum())
+
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        # Chroma gibi mevcut id'leri yok say
+        keep = [i for i, id_ in enumerate(ids) if id_ not in self.row_of]
+        self.upsert([ids[i] for i in keep], [embeddings[i] for i in keep],
+                    [metadatas[i] for i in keep] if metadatas else None,
+                    [documents[i] for i in keep] if documents else None)
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+            rows = []
+            with open(self.documents_path, "ab") as f:
+                for i, id_ in enumerate(ids):
+                    document = (documents[i] if documents else "").encode("utf-8")
+                    rows.append({"id": id_, "dim": self.dim, "metadata": metadatas[i] if metadatas else {},
+                                 "doc_offset": f.tell(), "doc_length": len(document)})
+                    f.write(document)
+            # Önce vektörler, sonra metadata: metadata satırı varsa vektörü de vardır
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.metadata_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+            live = np.ones(len(self.rows) + len(rows), dtype=bool)
+            live[:len(self.live)] = self.live
+            for row in rows:
+                if row["id"] in self.row_of:
+                    live[self.row_of[row["id"]]] = False
+                self.row_of[row["id"]] = len(self.rows)
+                if row["metadata"].get("deleted"):
+                    live[len(self.rows)] = False
+                    del self.row_of[row["id"]]
+                self.rows.append(row)
+            self.live = live
+
+    def delete(self, ids):
+        # Silme, sıfır vektörlü bir "deleted" satırı olarak eklenir; satırlar ve vektörler hizalı kalır
+        ids = [id_ for id_ in ids if id_ in self.row_of]
+        if ids:
+            self.upsert(ids, np.zeros((len(ids), self.dim), dtype=np.float32), [{"deleted": True}] * len(ids))
+
+    def document(self, row):
+        with open(self.documents_path, "rb") as f:
+            f.seek(row["doc_offset"])
+            return f.read(row["doc_length"]).decode("utf-8")
+
+    def query(self, query_embeddings, n_results=10, include=("metadatas", "documents", "distances")):
+        with self.lock:
+            rows, live, matrix = list(self.rows), self.live.copy(), self.vectors()
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        results = {"ids": [], "metadatas": [], "documents": [], "distances": []}
+        k = min(n_results, int(live.sum()))
+        if k == 0:
+            for key in results:
+                results[key] = [[] for _ in queries]
+            return results
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        # Tüm sorgular tek matris çarpımıyla puanlanır; silinmiş satırlar dışlanır
+        scores = queries @ matrix.T
+        scores[:, ~live] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for q in range(len(queries)):
+            order = top[q][np.argsort(-scores[q, top[q]])]
+            results["ids"].append([rows[i]["id"] for i in order])
+            results["distances"].append([float(1 - scores[q, i]) for i in order])
+            results["metadatas"].append([rows[i]["metadata"] for i in order] if "metadatas" in include else None)
+            results["documents"].append([self.document(rows[i]) for i in order] if "documents" in include else None)
+        return results
+
+    @staticmethod
+    def matches(metadata, where):
+        # Chroma where filtresinin kullandığımız kısmı: {"alan": değer} ve {"alan": {"$in": [...]}}
+        for field, condition in (where or {}).items():
+            value = metadata.get(field)
+            if isinstance(condition, dict) and "$in" in condition:
+                if value not in condition["$in"]:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    def get(self, ids=None, where=None, include=("metadatas", "documents"), limit=None, offset=0):
+        with self.lock:
+            if ids is not None:
+                indices = [self.row_of[id_] for id_ in ids if id_ in self.row_of]
+            else:
+                indices = [index for index, alive in enumerate(self.live) if alive]
+            if where:
+                indices = [index for index in indices if self.matches(self.rows[index]["metadata"], where)]
+            matrix = self.vectors() if "embeddings" in include else None
+        indices = indices[offset:offset + limit if limit is not None else None]
+        selected = [self.rows[index] for index in indices]
+        return {
+            "ids": [row["id"] for row in selected],
+            "embeddings": [np.array(matrix[index]) for index in indices] if matrix is not None else None,
+            "metadatas": [row["metadata"] for row in selected] if "metadatas" in include else None,
+            "documents": [self.document(row) for row in selected] if "documents" in include else None,
+        }
 
-# Koleksiyonu al veya oluştur
-collection = client.get_or_create_collection("obsidian_notes")
+# Chroma ağır bir bağımlılık; istemci ilk kullanımda başlatılır
+chroma_client = None
+collection = None
+collection_lock = threading.Lock()
+
+def get_collection():
+    global chroma_client, collection
+    with collection_lock:
+        if collection is None and VECTOR_BACKEND == "numpy":
+            collection = NumpyVectorStore(VECTOR_STORE_DIRECTORY)
+        elif collection is None:
+            import chromadb
+            from chromadb.config import Settings
+
+            # Dizinin var olduğundan emin ol
+            os.makedirs(CHROMA_PERSIST_DIRECTORY, exist_ok=True)
+
+            # Chroma client'ı başlat
+            chroma_client = chromadb.Client(Settings(
+                persist_directory=CHROMA_PERSIST_DIRECTORY,
+                is_persistent=True
+            ))
+
+            # Koleksiyonu al veya oluştur
+            collection = chroma_client.get_or_create_collection("obsidian_notes")
+    return collection
 
 CHECKPOINT_FILE = "research_checkpoint.json"
 
+# Araştırılmış konuların kalıcı dizini; Chroma'dan yalnızca ilk açılışta sayfalı olarak doldurulur
+TOPIC_INDEX_FILE = "topic_index.sqlite"
+TOPIC_INDEX_PAGE_SIZE = 500
+
+# Aşama günlüğü: tamamlanan her aşamanın çıktısı eklenerek yazılır, devam ederken atlanır
+JOURNAL_FILE = "research_journal.jsonl"
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+# Geri bağlantı bakımı: yeni notlar bekleme listesine eklenir, her geçiş yalnızca onları toplu sorgular
+BACKLINKS_PENDING_FILE = "backlinks_pending.txt"
+BACKLINKS_TOP_N = 3
+BACKLINKS_MAX_LINKS = 10
+
+# Araştırma durumu; signal_handler kesintide bunları kaydeder
+current_query = None
+iteration = 0
+researched_topics = {}
+auto_continue = False
+max_iterations = None
+frontier = None
+
+# Bir not için aynı anda üretilebilecek maksimum bölüm sayısı
+SECTION_CONCURRENCY = 4
+
+# Başsız toplu çalıştırma: kalıcı iş kuyruğu ve varsayılan limitler
+JOB_QUEUE_FILE = "jobs.sqlite"
+JOB_MAX_ATTEMPTS = 3
+BATCH_CONCURRENCY = 1
+BATCH_ITERATIONS = 5
+# Seçilen konu başka işlerce alınmışsa en fazla bu kadar yeni konu denenir, sonra iş bitirilir
+JOB_MAX_RESELECTIONS = 5
+
+# Bu benzerliğin üzerindeki aday konular mevcut bir notun tekrarı sayılır
+NOVELTY_THRESHOLD = 0.9
+
+# Araştırma sınırı (frontier): eşzamanlı konu sayısı, derinlik ve not başına izlenen kavram sayısı
+FRONTIER_WORKERS = 2
+FRONTIER_MAX_DEPTH = 5
+FRONTIER_MAX_BREADTH = 3
+
+# Spekülatif ön getirme: kullanıcı sonraki konuyu onaylarken aday konuların kaynakları arka planda toplanır.
+# İlk PREFETCH_WARM_TOPICS aday için ilk özet ve kaynak embedding'leri de önbelleğe ısıtılır. Kullanılmayanlar iptal
+# edilir; bellekte en fazla PREFETCH_MAX_BYTES kaynak metni tutulur.
+PREFETCH_ENABLED = True
+PREFETCH_TOPICS = 3
+PREFETCH_WARM_TOPICS = 1
+PREFETCH_WORKERS = 2
+PREFETCH_MAX_BYTES = 8 * 1024 * 1024
+
+# Kaynak adresleri (benchmark gibi yerel taklit sunucular için değiştirilebilir)
+GOOGLE_SEARCH_URL = "https://www.google.com/search?q={query}"
+ARXIV_API_URL = "https://export.arxiv.org/api/query?{}"
+
+# arXiv: aynı pencerede gelen konu sorguları tek OR sorgusunda birleştirilir; süreç genelinde istekler arası en az
+# ARXIV_MIN_INTERVAL saniye beklenir (arXiv API kullanım koşulları). Kayıtlar arXiv ID'siyle önbelleğe alınır.
+ARXIV_MIN_INTERVAL = 3.0
+ARXIV_BATCH_WINDOW = 0.5
+ARXIV_BATCH_MAX = 8
+ARXIV_BATCH_OVERSAMPLE = 2
+ARXIV_NAMESPACE = {"atom": "http://www.w3.org/2005/Atom"}
+
+# İlk dil pivot dildir; diğer dillerdeki başlıklar onun langlinks bilgisinden gelir
+WIKIPEDIA_LANGUAGES = ['en', 'de', 'fr', 'es', 'it']
+WIKIPEDIA_API_URL = "https://{lang}.wikipedia.org/w/api.php"
+WIKIPEDIA_BATCH_SIZE = 20
+WIKIPEDIA_EXTRACT_CHARS = 300
+
+# Kaynak toplama: genel süre sınırı (saniye) ve host başına eşzamanlı istek sınırı
+SOURCE_DEADLINE = 60
+SOURCE_WORKERS = 16
+# None = sınır yok; arXiv istekleri ArxivClient'ta birleştirilir ve süreç genelinde aralıklandırılır
+HOST_CONCURRENCY = {"www.google.com": 1, "export.arxiv.org": None}
+DEFAULT_HOST_CONCURRENCY = 2
+
+# Kaynak yanıt önbelleği: kaynak başına tazelik süresi (saniye). Süresi dolan Google yanıtları ETag/Last-Modified ile
+# yeniden doğrulanır; arXiv ve Wikipedia kayıt başına saklanır. SOURCE_OFFLINE açıkken ağa çıkılmaz.
+SOURCE_CACHE_FILE = "source_cache.sqlite"
+SOURCE_CACHE_MAX_BYTES = 128 * 1024 * 1024
+SOURCE_CACHE_TTLS = {"google": 24 * 3600, "arxiv": 24 * 3600, "wikipedia": 7 * 24 * 3600}
+SOURCE_OFFLINE = False
+
+# Ortak HTTP katmanı: (bağlantı, okuma) zaman aşımı, tekrar deneme ve bağlantı havuzu ayarları
+HTTP_TIMEOUT = (10, 300)
+# Ollama üretimleri uzun sürebilir: okuma zaman aşımı yok, zaman aşımına uğrayan üretim tekrar gönderilmez
+OLLAMA_TIMEOUT = (10, None)
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_BASE = 1.0
+HTTP_BACKOFF_MAX = 30
+HTTP_POOL_SIZE = 16
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+http_session.mount("https://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+http_stats = {}
+http_stats_lock = threading.Lock()
+
+# LLM üretim önbelleği; LLM_CACHE_BYPASS bilinçli yeniden üretim içindir (sonuçlar yine yazılır)
+LLM_CACHE_FILE = "llm_cache.sqlite"
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+LLM_CACHE_TTL = None
+LLM_CACHE_BYPASS = False
+
+# Görev türüne göre model ve seçenekler; tabloda olmayan görevler "default" kaydını kullanır.
+# Kısa görevler (filename, aliases, concepts) küçük bir modele yönlendirilebilir,
+# ör. {"model": "llama3.2:3b", "options": {"temperature": 0.2}}; options num_ctx varsayılanının üzerine yazılır.
+LLM_ROUTES = {
+    "default": {"model": "mistral-nemo"},
+    "filename": {"model": "mistral-nemo"},
+    "aliases": {"model": "mistral-nemo"},
+    "concepts": {"model": "mistral-nemo"},
+    "condense": {"model": "mistral-nemo"},
+    "summary": {"model": "mistral-nemo"},
+    "analysis": {"model": "mistral-nemo"},
+    "unique": {"model": "mistral-nemo"},
+    # Birleşik mod dört bölümü tek yanıtta üretir; çıktı için daha geniş bağlam gerekir
+    "fused": {"model": "mistral-nemo", "options": {"num_ctx": 8192}},
+}
+# Modeller istekler arasında bellekte tutulur; bir aşamanın modelleri o aşama başlamadan arka planda yüklenir
+OLLAMA_KEEP_ALIVE = "30m"
+LLM_PRELOAD = True
+MODEL_RESIDENCY_CHECK = 60
+
+# Ollama istek zamanlayıcısı: öncelik sınıfları (küçük sayı önce çalışır), AIMD ile ayarlanan eşzamanlılık ve kuyruk sınırı.
+# Ollama'nın kendi kuyruğunda bekleme (istemci süresi - total_duration) hedefi aşarsa ya da istek hata verirse sınır yarıya
+# iner; her başarılı istekte yavaşça artar. Kuyruk doluysa yeni istekler yer açılana kadar bekler.
+OLLAMA_CONCURRENCY_START = 2
+OLLAMA_CONCURRENCY_MIN = 1
+OLLAMA_CONCURRENCY_MAX = 8
+OLLAMA_QUEUE_DELAY_TARGET = 2.0
+OLLAMA_DECREASE_COOLDOWN = 5.0
+OLLAMA_MAX_QUEUE = 64
+LLM_PRIORITIES = {
+    "concepts": 0,   # sonraki iterasyonu bekletir
+    "filename": 1,
+    "aliases": 1,
+    "embedding": 1,
+    "default": 1,
+    "condense": 2,
+    "summary": 2,
+    "analysis": 2,
+    "unique": 2,
+    "fused": 2,
+    "prefetch": 3,   # spekülatif işler en son çalışır
+}
+
+# Birleşik bölüm üretimi: özet, önem/bağlantılar, ayrıntılı sonuçlar ve özgün bölüm tek JSON şemalı çağrıda üretilir;
+# ayrıştırılamayan ya da boş gelen alanlar eski tek bölümlük isteklerle üretilir
+LLM_FUSED_SECTIONS = False
+FUSED_SECTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "importance_and_connections": {"type": "string"},
+        "detailed_results": {"type": "string"},
+        "unique_title": {"type": "string"},
+        "unique_content": {"type": "string"},
+    },
+    "required": ["summary", "importance_and_connections", "detailed_results", "unique_title", "unique_content"],
+}
+
+# Embedding servisi: bellek + disk önbelleği ve toplu istekler
+EMBEDDING_MODEL = "mxbai-embed-large"
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite"
+EMBEDDING_CACHE_MAX_BYTES = 256 * 1024 * 1024
+EMBEDDING_BATCH_SIZE = 32
+
+# Not indeksleme: notlar başlık/boyut sınırında örtüşen parçalara bölünür, her parça embedding penceresine sığar.
+# Sorgular parça sonuçlarını not düzeyinde birleştirir; not başına NOTE_QUERY_OVERSAMPLE parça istenir.
+INDEX_CHUNK_TOKENS = 400
+INDEX_CHUNK_OVERLAP_TOKENS = 50
+NOTE_QUERY_OVERSAMPLE = 8
+
+# Kasa yeniden indeksleme (--reindex): içerik özeti değişmeyen notlar atlanır, değişenler paralel gruplar halinde
+# gömülüp toplu upsert edilir
+REINDEX_WORKERS = 4
+REINDEX_BATCH_NOTES = 32
+REINDEX_PAGE_SIZE = 500
+
+# Akış modu: tokenlar geldikçe bölüm dosyalarına yazılır; bütçe aşılınca üretim erken kesilir
+LLM_STREAMING = False
+STREAM_SECTION_DIR = "obsidian/.sections"
+STREAM_MAX_CHARS = None
+STREAM_STOP_PATTERNS = []
+
+# Bağlam bütçesi: kaynak metni num_ctx'e sığmazsa parçalar halinde özetlenip birleştirilir (map-reduce)
+LLM_NUM_CTX = 4096
+PROMPT_RESERVE_TOKENS = 512
+OUTPUT_RESERVE_TOKENS = 1024
+CONTEXT_BUDGET_TOKENS = LLM_NUM_CTX - PROMPT_RESERVE_TOKENS - OUTPUT_RESERVE_TOKENS
+CHARS_PER_TOKEN = 4
+CHUNK_TOKENS = 1536
+CHUNK_OVERLAP_TOKENS = 64
+SUMMARY_CONCURRENCY = 4
+
+# Ölçümler: her aşama bir span olarak JSONL'e yazılır; toplamlar Prometheus metin biçiminde dışa aktarılır
+METRICS_FILE = "metrics.jsonl"
+METRICS_PROM_FILE = "metrics.prom"
+OLLAMA_METRIC_FIELDS = ["total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration"]
+
+def record_http_stat(host, latency, retried=False, error=False):
+    with http_stats_lock:
+        stats = http_stats.setdefault(host, {"requests": 0, "retries": 0, "errors": 0, "total_latency": 0.0})
+        stats["requests"] += 1
+        stats["total_latency"] += latency
+        if retried:
+            stats["retries"] += 1
+        if error:
+            stats["errors"] += 1
+
+def backoff_delay(attempt, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), HTTP_BACKOFF_MAX)
+    # Full jitter exponential backoff
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+def http_request(method, url, timeout=HTTP_TIMEOUT, max_retries=HTTP_MAX_RETRIES, retry_read_timeout=True, **kwargs):
+    host = urlparse(url).netloc
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        try:
+            response = http_session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            record_http_stat(host, time.perf_counter() - start, retried=attempt > 0, error=True)
+            # Okuma zaman aşımında istek sunucuya ulaşmıştır; pahalı işlerde (LLM üretimi) tekrar göndermek yükü katlar
+            if attempt == max_retries or (isinstance(e, requests.exceptions.ReadTimeout) and not retry_read_timeout):
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        retryable = response.status_code in RETRY_STATUS_CODES
+        record_http_stat(host, time.perf_counter() - start, retried=attempt > 0, error=retryable)
+        if not retryable or attempt == max_retries:
+            return response
+        time.sleep(backoff_delay(attempt, response))
+        response.close()
+
+def format_http_stats():
+    with http_stats_lock:
+        lines = []
+        for host, stats in sorted(http_stats.items()):
+            avg = stats["total_latency"] / stats["requests"]
+            lines.append(f"{host}: {stats['requests']} requests, {stats['retries']} retries, "
+                         f"{stats['errors']} errors, avg {avg * 1000:.0f} ms")
+        return "\n".join(lines)
+
+class Metrics:
+    def __init__(self, path, prom_path):
+        self.path = path
+        self.prom_path = prom_path
+        self.stages = {}
+        self.llm = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @contextmanager
+    def span(self, stage, **labels):
+        # Aynı iş parçacığındaki dış span, üst aşama ve konu bilgisini sağlar
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        parent = stack[-1] if stack else {}
+        record = {"stage": stage, "parent": parent.get("stage"), "topic": parent.get("topic"), **labels}
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            record["duration"] = round(time.perf_counter() - start, 4)
+            record["ts"] = datetime.now().isoformat()
+            self.record(record)
+
+    def record(self, record):
+        with self.lock:
+            stats = self.stages.setdefault(record["stage"], {"calls": 0, "seconds": 0.0, "errors": 0})
+            stats["calls"] += 1
+            stats["seconds"] += record["duration"]
+            if "error" in record:
+                stats["errors"] += 1
+            if "model" in record:
+                totals = self.llm.setdefault((record["model"], record["parent"] or "none"), {"requests": 0})
+                totals["requests"] += 1
+                for field in OLLAMA_METRIC_FIELDS:
+                    totals[field] = totals.get(field, 0) + record.get(field, 0)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def prometheus(self):
+        with self.lock:
+            lines = []
+            for field in ["calls", "seconds", "errors"]:
+                lines.append(f"# TYPE cognichain_stage_{field}_total counter")
+                for stage, stats in sorted(self.stages.items()):
+                    lines.append(f'cognichain_stage_{field}_total{{stage="{stage}"}} {stats[field]:g}')
+            llm_metrics = [("requests", "cognichain_llm_requests_total", 1),
+                           ("prompt_eval_count", "cognichain_llm_prompt_tokens_total", 1),
+                           ("eval_count", "cognichain_llm_eval_tokens_total", 1),
+                           ("prompt_eval_duration", "cognichain_llm_prompt_eval_seconds_total", 1e9),
+                           ("eval_duration", "cognichain_llm_eval_seconds_total", 1e9),
+                           ("load_duration", "cognichain_llm_load_seconds_total", 1e9),
+                           ("total_duration", "cognichain_llm_seconds_total", 1e9)]
+            for field, name, scale in llm_metrics:
+                lines.append(f"# TYPE {name} counter")
+                for (model, stage), totals in sorted(self.llm.items()):
+                    lines.append(f'{name}{{model="{model}",stage="{stage}"}} {totals.get(field, 0) / scale:g}')
+            return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        write_atomic(self.prom_path, self.prometheus())
+
+def generation_metrics(data):
+    return {field: data[field] for field in OLLAMA_METRIC_FIELDS if field in data}
+
+metrics = Metrics(METRICS_FILE, METRICS_PROM_FILE)
+
+class DiskCache:
+    # SQLite tabanlı, boyut sınırlı LRU önbellek; ttl saniye cinsinden (None = süresiz)
+    def __init__(self, path, max_bytes, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = None
+        self.total = 0
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY, value TEXT, size INTEGER, created REAL, accessed REAL)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+            # Toplam boyut bir kez okunur, sonra yazma ve silmelerle güncel tutulur
+            self.total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        return self.conn
+
+    def get(self, key):
+        with self.lock:
+            conn = self.connect()
+            row = conn.execute("SELECT value, created, size FROM cache WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row and self.ttl is not None and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                conn.commit()
+                self.total -= row[2]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        # Tüm kayıtlar tek işlemde yazılır; toplu embedding ve arXiv yazımları tek commit yapar
+        with self.lock:
+            conn = self.connect()
+            now = time.time()
+            for key, value in items:
+                old = conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+                size = len(value.encode("utf-8"))
+                conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now))
+                self.total += size - (old[0] if old else 0)
+            if self.total > self.max_bytes:
+                # En uzun süredir kullanılmayan kayıtları sınırın altına inene kadar sil
+                evict = []
+                for old_key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed"):
+                    if self.total <= self.max_bytes:
+                        break
+                    evict.append((old_key,))
+                    self.total -= size
+                conn.executemany("DELETE FROM cache WHERE key = ?", evict)
+            conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0
+        return f"{self.hits} hits, {self.misses} misses ({hit_rate:.0f}% hit rate)"
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+source_cache = DiskCache(SOURCE_CACHE_FILE, SOURCE_CACHE_MAX_BYTES)
+source_cache_stats = {"fresh": 0, "revalidated": 0, "fetched": 0, "offline_misses": 0}
+source_cache_stats_lock = threading.Lock()
+
+def record_source_cache(outcome):
+    with source_cache_stats_lock:
+        source_cache_stats[outcome] += 1
+
+class CachedResponse:
+    # Önbellekten dönen yanıt; kaynak fonksiyonlarının kullandığı requests.Response alt kümesi
+    def __init__(self, entry):
+        self.status_code = entry["status"]
+        self.text = entry["body"]
+        self.headers = {"ETag": entry.get("etag"), "Last-Modified": entry.get("last_modified")}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        pass
+
+def cached_get(source, url, params=None, headers=None):
+    # Anahtar yalnızca URL ve parametrelerdir; User-Agent gibi başlıklar yanıtı değiştirmez
+    key = cache_key("GET", url, sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    cached = source_cache.get(key)
+    entry = json.loads(cached) if cached is not None else None
+    if entry and (SOURCE_OFFLINE or time.time() - entry["fetched"] < SOURCE_CACHE_TTLS.get(source, 0)):
+        record_source_cache("fresh")
+        return CachedResponse(entry)
+    if SOURCE_OFFLINE:
+        record_source_cache("offline_misses")
+        raise requests.exceptions.ConnectionError(f"Offline mode: no cached response for {url}")
+
+    headers = dict(headers or {})
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    response = http_request("GET", url, params=params, headers=headers)
+    if response.status_code == 304 and entry:
+        # Değişmemiş; gövdeyi tekrar indirmeden tazelik süresini yenile
+        record_source_cache("revalidated")
+        entry["fetched"] = time.time()
+        source_cache.set(key, json.dumps(entry))
+        return CachedResponse(entry)
+    if response.ok:
+        record_source_cache("fetched")
+        entry = {"status": response.status_code, "body": response.text, "fetched": time.time(),
+                 "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        source_cache.set(key, json.dumps(entry))
+    return response
+
+def format_source_cache_stats():
+    with source_cache_stats_lock:
+        stats = dict(source_cache_stats)
+    return (f"{stats['fresh']} fresh hits, {stats['revalidated']} revalidated, {stats['fetched']} fetched"
+            + (f", {stats['offline_misses']} offline misses" if stats["offline_misses"] else ""))
+
 def internet_search(query, num_results=5):
-    url = f"https://www.google.com/search?q={query}"
+    url = GOOGLE_SEARCH_URL.format(query=query)
     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-    response = requests.get(url, headers=headers)
+    response = cached_get("google", url, headers=headers)
     soup = BeautifulSoup(response.text, 'html.parser')
     results = soup.find_all('div', class_='g')
     return [result.get_text() for result in results[:num_results]]
 
-def wikipedia_search(query, languages=['en', 'de', 'fr', 'es', 'it']):
-    results = {}
-    for lang in languages:
-        url = f"https://{lang}.wikipedia.org/w/api.php"
+def normalize_wikipedia_title(title):
+    # MediaWiki gibi normalize et ("quantum_entanglement" -> "Quantum entanglement")
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+def wikipedia_cached(key):
+    # Wikipedia kaynak önbelleğinde ham yanıt yerine başlık/arama başına saklanır (arXiv kayıtları gibi)
+    cached = source_cache.get(key)
+    entry = json.loads(cached) if cached is not None else None
+    if entry and (SOURCE_OFFLINE or time.time() - entry["fetched"] < SOURCE_CACHE_TTLS["wikipedia"]):
+        record_source_cache("fresh")
+        return entry
+    if SOURCE_OFFLINE:
+        record_source_cache("offline_misses")
+    return None
+
+def wikipedia_search_hit(query, lang):
+    key = cache_key("wikipedia-search", lang, normalize_wikipedia_title(query))
+    entry = wikipedia_cached(key)
+    if entry is not None:
+        return entry["hit"]
+    if SOURCE_OFFLINE:
+        return None
+
+    url = WIKIPEDIA_API_URL.format(lang=lang)
+    params = {
+        "action": "query",
+        "format": "json",
+        "list": "search",
+        "srsearch": query,
+        "srlimit": 1,
+        "srprop": "snippet"
+    }
+    response = http_request("GET", url, params=params)
+    response.raise_for_status()
+    data = response.json()
+    if not data['query']['search']:
+        # If no direct match, try a more general search
+        params["srsearch"] = f"{query} topic"
+        response = http_request("GET", url, params=params)
+        response.raise_for_status()
+        data = response.json()
+    hit = data['query']['search'][0] if data['query']['search'] else None
+    record_source_cache("fetched")
+    source_cache.set(key, json.dumps({"hit": hit, "fetched": time.time()}))
+    return hit
+
+def wikipedia_query_pages(lang, titles):
+    # titles= ile toplu sorgu; özet ve dil bağlantıları tek istekte gelir
+    url = WIKIPEDIA_API_URL.format(lang=lang)
+    pages = {}
+    aliases = {}
+    for start in range(0, len(titles), WIKIPEDIA_BATCH_SIZE):
         params = {
             "action": "query",
             "format": "json",
-            "list": "search",
-            "srsearch": query,
-            "srlimit": 1,
-            "srprop": "snippet"
+            "formatversion": 2,
+            "titles": "|".join(titles[start:start + WIKIPEDIA_BATCH_SIZE]),
+            "prop": "extracts|langlinks",
+            "exintro": 1,
+            "explaintext": 1,
+            "exchars": WIKIPEDIA_EXTRACT_CHARS,
+            "exlimit": "max",
+            "lllimit": "max",
+            "redirects": 1
         }
-        try:
-            response = requests.get(url, params=params)
+        while True:
+            response = http_request("GET", url, params=params)
             response.raise_for_status()
+            record_source_cache("fetched")
             data = response.json()
-            if data['query']['search']:
-                title = data['query']['search'][0]['title']
-                snippet = data['query']['search'][0]['snippet']
-                results[lang] = f"{title}: {snippet}"
-            else:
-                # If no direct match, try a more general search
-                params["srsearch"] = f"{query} topic"
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                if data['query']['search']:
-                    title = data['query']['search'][0]['title']
-                    snippet = data['query']['search'][0]['snippet']
-                    results[lang] = f"{title}: {snippet}"
+            query = data.get('query', {})
+            for item in query.get('normalized', []) + query.get('redirects', []):
+                aliases[item['from']] = item['to']
+            for page in query.get('pages', []):
+                if page.get('missing') or page.get('invalid'):
+                    continue
+                entry = pages.setdefault(page['title'], {"title": page['title'], "extract": "", "langlinks": {}})
+                if page.get('extract'):
+                    entry["extract"] = page['extract']
+                for link in page.get('langlinks', []):
+                    entry["langlinks"][link['lang']] = link['title']
+            if 'continue' not in data:
+                break
+            params = {**params, **data['continue']}
+
+    resolved = {}
+    for title in titles:
+        target, seen = title, set()
+        while target in aliases and target not in seen:
+            seen.add(target)
+            target = aliases[target]
+        if target in pages:
+            resolved[title] = pages[target]
+    return resolved
+
+def wikipedia_lookup(lang, titles):
+    # (dil, normalize başlık) başına önbellek; bulunamayan başlıklar da saklanır
+    titles = list(dict.fromkeys(normalize_wikipedia_title(title) for title in titles if title.strip()))
+    results = {}
+    missing = []
+    for title in titles:
+        entry = wikipedia_cached(cache_key("wikipedia-page", lang, title))
+        if entry is None:
+            missing.append(title)
+        elif entry["page"]:
+            results[title] = entry["page"]
+    if missing and not SOURCE_OFFLINE:
+        try:
+            found = wikipedia_query_pages(lang, missing)
         except requests.exceptions.RequestException as e:
-            print(f"Error during {lang} Wikipedia search: {str(e)}")
-    
-    return results if results else "No results found in any language."
+            print(f"Error during {lang} Wikipedia lookup: {str(e)}")
+            return results
+        now = time.time()
+        source_cache.set_many([(cache_key("wikipedia-page", lang, title), json.dumps({"page": found.get(title), "fetched": now}))
+                               for title in missing])
+        results.update((title, found[title]) for title in missing if title in found)
+    return results
+
+def wikipedia_resolve_topics(topics, lang=WIKIPEDIA_LANGUAGES[0]):
+    pages = wikipedia_lookup(lang, topics)
+    resolved = {}
+    searched = {}
+    for topic in topics:
+        title = normalize_wikipedia_title(topic)
+        if title in pages:
+            resolved[topic] = pages[title]
+        else:
+            # Başlık doğrudan eşleşmezse aramaya geri dön
+            try:
+                hit = wikipedia_search_hit(topic, lang)
+            except requests.exceptions.RequestException as e:
+                print(f"Error during {lang} Wikipedia search: {str(e)}")
+                hit = None
+            if hit:
+                searched[topic] = hit['title']
+    if searched:
+        pages = wikipedia_lookup(lang, list(searched.values()))
+        for topic, title in searched.items():
+            if normalize_wikipedia_title(title) in pages:
+                resolved[topic] = pages[normalize_wikipedia_title(title)]
+    return resolved
+
+def wikipedia_fetch_language(pages, lang):
+    # Diğer dillerdeki sayfalar bağımsız arama yerine pivot sayfanın langlinks'inden bulunur
+    titles = {topic: page["langlinks"][lang] for topic, page in pages.items() if lang in page["langlinks"]}
+    found = wikipedia_lookup(lang, list(titles.values()))
+    return {topic: found[normalize_wikipedia_title(title)] for topic, title in titles.items()
+            if normalize_wikipedia_title(title) in found}
+
+def strip_list_marker(line):
+    # LLM liste işaretlerini ("1. ", "- ", "* ") at; başlığın kendisindeki rakamlar korunur ("3D printing")
+    return re.sub(r'^\s*(?:[-*•]|\d+[.)])\s+', '', line).strip()
 
 def get_wikipedia_topics(query):
     prompt = f"""Suggest 5 Wikipedia article titles related to the topic "{query}" that would be useful for research. 
@@ -81,65 +851,522 @@ def get_wikipedia_topics(query):
     Include both specific and general terms.
     Format your response as a simple list of 5 titles, each on a new line."""
     
-    response = chat_with_llm(prompt)
-    topics = [title.strip() for title in response.split('\n') if title.strip()]
+    response = chat_with_llm(prompt, task="concepts")
+    topics = [strip_list_marker(title) for title in response.split('\n')]
+    topics = [topic for topic in topics if topic]
     
     # Add some general terms related to the query
     general_terms = [query, f"{query} concept", f"{query} in culture", f"{query} history", f"{query} examples"]
     
     return list(set(topics + general_terms))  # Remove duplicates
 
-def chat_with_llm(prompt, model="mistral-nemo", max_tokens=None):
+# Host sınırları süreç genelidir: ön getirme ve eşzamanlı konular aynı semaforları paylaşır
+host_semaphores = {}
+host_semaphores_lock = threading.Lock()
+
+def host_limited(host, fn, *args):
+    # İş parçacığında çalışır; semafor istek süresince tutulur
+    if HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY) is None:
+        return fn(*args)
+    with host_semaphores_lock:
+        if host not in host_semaphores:
+            host_semaphores[host] = threading.BoundedSemaphore(HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY))
+        semaphore = host_semaphores[host]
+    with semaphore:
+        return fn(*args)
+
+async def gather_sources_async(query, deadline=SOURCE_DEADLINE):
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=SOURCE_WORKERS)
+    google_results, arxiv_results, wiki_topics, wiki_results = [], [], [], {}
+
+    async def fetch(host, fn, *args):
+        try:
+            return await loop.run_in_executor(executor, ollama_scheduler.carry(host_limited), host, fn, *args)
+        except Exception as e:
+            print(f"Error fetching from {host}: {str(e)}")
+            return None
+
+    async def google():
+        google_results.extend(await fetch("www.google.com", internet_search, query, 5) or [])
+
+    async def papers():
+        arxiv_results.extend(await fetch("export.arxiv.org", arxiv_search, query, 5) or [])
+
+    async def wiki_lang(pages, lang):
+        found = await fetch(f"{lang}.wikipedia.org", wikipedia_fetch_language, pages, lang) or {}
+        for topic, page in found.items():
+            wiki_results.setdefault(topic, {})[lang] = f"{page['title']}: {page['extract']}"
+
+    async def wikipedia():
+        wiki_topics.extend(await fetch("ollama", get_wikipedia_topics, query) or [])
+        pivot = WIKIPEDIA_LANGUAGES[0]
+        pages = await fetch(f"{pivot}.wikipedia.org", wikipedia_resolve_topics, wiki_topics, pivot) or {}
+        for topic, page in pages.items():
+            wiki_results.setdefault(topic, {})[pivot] = f"{page['title']}: {page['extract']}"
+        await asyncio.gather(*(wiki_lang(pages, lang) for lang in WIKIPEDIA_LANGUAGES[1:]))
+
+    tasks = [asyncio.create_task(stage()) for stage in (google, papers, wikipedia)]
     try:
-        json_data = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {"num_ctx": 4096}  # Reset context for each new chat
-        }
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        if pending:
+            print(f"Source gathering exceeded {deadline}s; continuing with partial results.")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # Promptların beklediği all_results düzenini koru
+    all_results = "Google Search Results:\n"
+    for i, result in enumerate(google_results, 1):
+        all_results += f"Result {i}: {result[:200]}...\n"
+    all_results += "\nArxiv Search Results:\n"
+    for i, result in enumerate(arxiv_results, 1):
+        all_results += f"Result {i}: {result['title']} - {result['summary']}\n"
+    all_results += "\nWikipedia Search Results:\n"
+    for topic in wiki_topics:
+        if topic in wiki_results:
+            for lang in WIKIPEDIA_LANGUAGES:
+                if lang in wiki_results[topic]:
+                    all_results += f"{topic} ({lang.upper()}): {wiki_results[topic][lang]}\n"
+        else:
+            all_results += f"{topic}: No results found in any language.\n"
+    return all_results
+
+def gather_sources(query, deadline=SOURCE_DEADLINE):
+    return asyncio.run(gather_sources_async(query, deadline))
+
+llm_cache = DiskCache(LLM_CACHE_FILE, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL)
+
+section_stream = threading.local()
+
+def write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def stream_generate(json_data, stream_path=None, max_chars=None, stop_patterns=None, record=None):
+    tmp_path = f"{stream_path}.tmp" if stream_path else None
+    out = open(tmp_path, "w", encoding="utf-8") if tmp_path else None
+    result = ""
+    response = http_request("POST", f"{OLLAMA_URL}/api/generate", json={**json_data, "stream": True}, stream=True,
+                            timeout=OLLAMA_TIMEOUT, retry_read_timeout=False)
+    try:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            token = chunk.get("response", "")
+            result += token
+            if out:
+                out.write(token)
+                out.flush()
+            if chunk.get("done"):
+                if record is not None:
+                    record.update(generation_metrics(chunk))
+                break
+            # Bütçe aşıldığında bağlantıyı kapatmak Ollama'da üretimi de durdurur
+            if max_chars and len(result) >= max_chars:
+                result = result[:max_chars]
+                break
+            stops = [result.find(pattern) for pattern in stop_patterns or [] if pattern in result]
+            if stops:
+                result = result[:min(stops)]
+                break
+    finally:
+        response.close()
+        if out:
+            out.close()
+    if stream_path:
+        write_atomic(stream_path, result)
+    return result
+
+def llm_route(task):
+    route = LLM_ROUTES.get(task, LLM_ROUTES["default"])
+    return route["model"], {"num_ctx": LLM_NUM_CTX, **route.get("options", {})}
+
+def ollama_model_name(model):
+    return model if ":" in model else f"{model}:latest"
+
+resident_models = {}
+resident_models_lock = threading.Lock()
+
+def preload_models(tasks):
+    # /api/ps ile yüklü modelleri kontrol et; eksik olanları boş istekle keep_alive süresince belleğe al
+    models = {EMBEDDING_MODEL if task == "embedding" else llm_route(task)[0] for task in tasks}
+    now = time.monotonic()
+    with resident_models_lock:
+        stale = [model for model in models if now - resident_models.get(model, -MODEL_RESIDENCY_CHECK) >= MODEL_RESIDENCY_CHECK]
+        for model in stale:
+            resident_models[model] = now
+    if not stale:
+        return
+    try:
+        response = http_request("GET", f"{OLLAMA_URL}/api/ps", max_retries=0)
+        response.raise_for_status()
+        loaded = {entry.get("model") or entry.get("name") for entry in response.json().get("models", [])}
+        for model in stale:
+            if ollama_model_name(model) in loaded:
+                continue
+            print(f"Loading model {model}...")
+            if model == EMBEDDING_MODEL:
+                payload = {"model": model, "input": [], "keep_alive": OLLAMA_KEEP_ALIVE}
+                http_request("POST", f"{OLLAMA_URL}/api/embed", json=payload, timeout=OLLAMA_TIMEOUT, retry_read_timeout=False).raise_for_status()
+            else:
+                payload = {"model": model, "keep_alive": OLLAMA_KEEP_ALIVE}
+                http_request("POST", f"{OLLAMA_URL}/api/generate", json=payload, timeout=OLLAMA_TIMEOUT, retry_read_timeout=False).raise_for_status()
+    except requests.exceptions.RequestException as e:
+        # Ön yükleme yalnızca bir iyileştirme; hata olursa model ilk istekte yüklenir
+        print(f"Error preloading models: {str(e)}")
+        with resident_models_lock:
+            for model in stale:
+                resident_models.pop(model, None)
+
+def preload_models_async(tasks):
+    if LLM_PRELOAD:
+        threading.Thread(target=preload_models, args=(tasks,), daemon=True).start()
+
+class OllamaScheduler:
+    def __init__(self, start, min_limit, max_limit, max_queue):
+        self.limit = float(start)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = []
+        self.counter = 0
+        self.last_decrease = 0.0
+        self.stats = {"requests": 0, "decreases": 0, "peak_queue": 0, "wait_seconds": 0.0}
+        self.cond = threading.Condition()
+        self.local = threading.local()
+
+    @contextmanager
+    def background(self, priority):
+        # Bu iş parçacığındaki istekler en az verilen öncelik sınıfında bekler
+        previous = getattr(self.local, "floor", None)
+        self.local.floor = priority
+        try:
+            yield
+        finally:
+            self.local.floor = previous
+
+    def carry(self, fn):
+        # background() iş parçacığına özgüdür; havuza gönderilen işler çağıranın öncelik tabanını taşır
+        floor = getattr(self.local, "floor", None)
+        def run(*args):
+            with self.background(floor):
+                return fn(*args)
+        return run
+
+    @contextmanager
+    def slot(self, priority):
+        start = time.perf_counter()
+        floor = getattr(self.local, "floor", None)
+        if floor is not None:
+            priority = max(priority, floor)
+        with self.cond:
+            # Backpressure: kuyruk doluysa sıraya girmeden bekle
+            while len(self.waiting) >= self.max_queue:
+                self.cond.wait()
+            self.counter += 1
+            ticket = (priority, self.counter)
+            heapq.heappush(self.waiting, ticket)
+            self.stats["peak_queue"] = max(self.stats["peak_queue"], len(self.waiting))
+            while self.waiting[0] != ticket or self.active >= int(self.limit):
+                self.cond.wait()
+            heapq.heappop(self.waiting)
+            self.active += 1
+            self.stats["requests"] += 1
+            self.stats["wait_seconds"] += time.perf_counter() - start
+            self.cond.notify_all()
+        feedback = {}
+        sent = time.perf_counter()
+        try:
+            yield feedback
+        except requests.exceptions.RequestException:
+            self.decrease()
+            raise
+        else:
+            # Ollama total_duration bildirmezse kuyruk gecikmesi bilinmez; başarı sayılır
+            elapsed = time.perf_counter() - sent
+            if elapsed - feedback.get("server_seconds", elapsed) > OLLAMA_QUEUE_DELAY_TARGET:
+                self.decrease()
+            else:
+                self.increase()
+        finally:
+            with self.cond:
+                self.active -= 1
+                self.cond.notify_all()
+
+    def increase(self):
+        with self.cond:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+    def decrease(self):
+        with self.cond:
+            # Aynı aşırı yük dalgasındaki istekler sınırı bir kez düşürür
+            if time.monotonic() - self.last_decrease < OLLAMA_DECREASE_COOLDOWN:
+                return
+            self.last_decrease = time.monotonic()
+            self.limit = max(self.min_limit, self.limit / 2)
+            self.stats["decreases"] += 1
+
+    def format_stats(self):
+        with self.cond:
+            stats = dict(self.stats)
+            limit = self.limit
+        avg_wait = stats["wait_seconds"] / stats["requests"] if stats["requests"] else 0
+        return (f"{stats['requests']} requests, concurrency limit {limit:.1f}, {stats['decreases']} decreases, "
+                f"peak queue {stats['peak_queue']}, avg wait {avg_wait * 1000:.0f} ms")
+
+ollama_scheduler = OllamaScheduler(OLLAMA_CONCURRENCY_START, OLLAMA_CONCURRENCY_MIN, OLLAMA_CONCURRENCY_MAX, OLLAMA_MAX_QUEUE)
+
+def ollama_generate(prompt, model=None, options=None, use_cache=True, stream=None, task="default", format=None):
+    route_model, route_options = llm_route(task)
+    model = model or route_model
+    options = options or route_options
+    # Yapılandırılmış çıktı parça parça dosyaya yazılmaz
+    stream = (LLM_STREAMING if stream is None else stream) and format is None
+    stream_path = getattr(section_stream, "path", None) if stream else None
+    if stream and (STREAM_MAX_CHARS or STREAM_STOP_PATTERNS):
+        key = cache_key(model, prompt, options, STREAM_MAX_CHARS, STREAM_STOP_PATTERNS)
+    elif format is not None:
+        key = cache_key(model, prompt, options, format)
+    else:
+        key = cache_key(model, prompt, options)
+    if use_cache and not LLM_CACHE_BYPASS:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            if stream_path:
+                write_atomic(stream_path, cached)
+            return cached
+
+    json_data = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "options": options,
+        "keep_alive": OLLAMA_KEEP_ALIVE
+    }
+    if format is not None:
+        json_data["format"] = format
+    with ollama_scheduler.slot(LLM_PRIORITIES.get(task, LLM_PRIORITIES["default"])) as slot, \
+            metrics.span("llm.generate", model=model, task=task) as record:
+        if stream:
+            result = stream_generate(json_data, stream_path, STREAM_MAX_CHARS, STREAM_STOP_PATTERNS, record)
+        else:
+            response = http_request("POST", f"{OLLAMA_URL}/api/generate", json=json_data, timeout=OLLAMA_TIMEOUT, retry_read_timeout=False)
+            response.raise_for_status()
+            data = response.json()
+            result = data['response']
+            record.update(generation_metrics(data))
+        if "total_duration" in record:
+            slot["server_seconds"] = record["total_duration"] / 1e9
+    # Hata metinleri önbelleğe girmez; yalnızca başarılı üretimler saklanır
+    if use_cache:
+        llm_cache.set(key, result)
+    return result
+
+def chat_with_llm(prompt, model=None, max_tokens=None, use_cache=True, task="default"):
+    try:
+        route_model, options = llm_route(task)  # Reset context for each new chat
         if max_tokens:
-            json_data["options"]["num_predict"] = max_tokens
+            options["num_predict"] = max_tokens
         
-        response = requests.post(f"{OLLAMA_URL}/api/generate", json=json_data)
-        response.raise_for_status()
-        return response.json()['response']
+        return ollama_generate(prompt, model or route_model, options, use_cache, task=task)
     except requests.exceptions.RequestException as e:
         return f"Error communicating with LLM: {str(e)}"
 
+def estimate_tokens(text):
+    # Tokenizer gerektirmeyen kaba tahmin
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # Mümkünse satır sonunda böl
+            newline = text.rfind("\n", start + max_chars // 2, end)
+            if newline != -1:
+                end = newline + 1
+        chunks.append(text[start:end])
+        if end == len(text):
+            break
+        start = max(end - overlap_chars, start + 1)
+    return chunks
+
+def summarize_chunk(chunk, max_tokens):
+    prompt = f"""Condense the following excerpt of research results. Keep names, numbers, sources and key claims.
+    Do not add anything that is not in the excerpt.
+
+    Excerpt:
+    {chunk}
+    """
+    summary = chat_with_llm(prompt, max_tokens=max_tokens, task="condense")
+    if summary.startswith("Error communicating with LLM"):
+        return chunk[:max_tokens * CHARS_PER_TOKEN]
+    return summary
+
+@lru_cache(maxsize=64)
+def condense_context(text, budget=CONTEXT_BUDGET_TOKENS, depth=0):
+    if estimate_tokens(text) <= budget:
+        return text
+    if depth >= 3:
+        return text[:budget * CHARS_PER_TOKEN]
+    # Map: parçaları eşzamanlı özetle (özetler LLM önbelleğinde saklanır); reduce: birleştir, gerekirse tekrarla
+    chunks = chunk_text(text)
+    share = max(128, budget // len(chunks))
+    with ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY) as executor:
+        summaries = list(executor.map(ollama_scheduler.carry(lambda chunk: summarize_chunk(chunk, share)), chunks))
+    return condense_context("\n\n".join(summaries), budget, depth + 1)
+
+embedding_cache = DiskCache(EMBEDDING_CACHE_FILE, EMBEDDING_CACHE_MAX_BYTES)
+embedding_memory = {}
+embedding_lock = threading.Lock()
+
+def unit_vector(embedding):
+    # distance_to_similarity birim uzunluk varsayar; eski /api/embeddings çıktıları normalize değildir
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm else embedding
+
+def generate_embeddings_ollama(texts, remember=True):
+    # remember=False: toplu yeniden indekslemede bellek önbelleği büyümez (disk önbelleği yine yazılır)
+    keys = [cache_key(EMBEDDING_MODEL, text) for text in texts]
+    found = {}
+    missing = {}
+    for key, text in zip(keys, texts):
+        with embedding_lock:
+            if key in embedding_memory:
+                found[key] = embedding_memory[key]
+                continue
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            found[key] = unit_vector(np.frombuffer(base64.b64decode(cached), dtype=np.float32))
+        else:
+            missing[key] = text
+
+    # Önbellekte olmayan metinleri tek istekte toplu olarak gönder
+    pending = list(missing.items())
+    for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+        batch = pending[start:start + EMBEDDING_BATCH_SIZE]
+        try:
+            with ollama_scheduler.slot(LLM_PRIORITIES["embedding"]) as slot, \
+                    metrics.span("embedding", model=EMBEDDING_MODEL, texts=len(batch)) as record:
+                response = http_request("POST", f"{OLLAMA_URL}/api/embed", json={
+                    "model": EMBEDDING_MODEL,
+                    "input": [text for _, text in batch],
+                    "keep_alive": OLLAMA_KEEP_ALIVE
+                }, timeout=OLLAMA_TIMEOUT, retry_read_timeout=False)
+                response.raise_for_status()
+                data = response.json()
+                record.update(generation_metrics(data))
+                if "total_duration" in data:
+                    slot["server_seconds"] = data["total_duration"] / 1e9
+            for (key, _), embedding in zip(batch, data['embeddings']):
+                found[key] = unit_vector(np.asarray(embedding, dtype=np.float32))
+            embedding_cache.set_many([(key, base64.b64encode(found[key].tobytes()).decode("ascii"))
+                                      for key, _ in batch if key in found])
+        except requests.exceptions.RequestException as e:
+            print(f"Error generating embedding: {str(e)}")
+
+    if remember:
+        with embedding_lock:
+            embedding_memory.update(found)
+    return [found.get(key) for key in keys]
+
 def generate_embedding_ollama(text):
-    try:
-        response = requests.post(f"{OLLAMA_URL}/api/embeddings", json={
-            "model": "mxbai-embed-large",
-            "prompt": text
-        })
-        response.raise_for_status()
-        return np.array(response.json()['embedding'])
-    except requests.exceptions.RequestException as e:
-        print(f"Error generating embedding: {str(e)}")
-        return None
+    return generate_embeddings_ollama([text])[0]
+
+def chunk_note(text, max_tokens=INDEX_CHUNK_TOKENS, overlap_tokens=INDEX_CHUNK_OVERLAP_TOKENS):
+    # Önce Markdown başlıklarından böl; küçük bölümler birleştirilir, büyükler örtüşmeli parçalara ayrılır
+    chunks = []
+    for section in re.split(r'\n(?=#{1,6} )', text):
+        if not section.strip():
+            continue
+        if chunks and estimate_tokens(chunks[-1] + "\n" + section) <= max_tokens:
+            chunks[-1] += "\n" + section
+        else:
+            chunks.extend(chunk_text(section, max_tokens, overlap_tokens))
+    return chunks or [text]
+
+def embed_note(text, remember=True):
+    chunks = chunk_note(text)
+    return chunks, generate_embeddings_ollama(chunks, remember)
+
+def index_notes(collection, notes, upsert=False, remember=True):
+    # notes: (not id, metin, metadata) listesi; tüm parçalar toplu gömülür ve tek add/upsert ile yazılır
+    ids, documents, embeddings, metadatas = [], [], [], []
+    for note_id, text, metadata in notes:
+        chunks, vectors = embed_note(text, remember)
+        for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
+            if vector is None:
+                continue
+            ids.append(f"{note_id}#{i}")
+            documents.append(chunk)
+            embeddings.append(vector.tolist())
+            metadatas.append({**metadata, "parent": note_id, "chunk": i, "chunks": len(chunks)})
+    if not ids:
+        return 0
+    with metrics.span("chroma.upsert" if upsert else "chroma.add", chunks=len(ids)):
+        (collection.upsert if upsert else collection.add)(
+            ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+    return len(ids)
+
+def query_notes(collection, queries, n_notes, exclude=(), include_documents=False):
+    # queries: her biri bir ya da daha çok vektörden oluşan mantıksal sorgular; hepsi tek toplu sorguda aranır.
+    # Parça sonuçları üst nota göre birleştirilir, notun en yakın parçası notun mesafesi sayılır.
+    count = collection.count()
+    vectors = [np.asarray(vector, dtype=np.float32).tolist() for group in queries for vector in group]
+    if not vectors or not count:
+        return [[] for _ in queries]
+    include = ["metadatas", "distances"] + (["documents"] if include_documents else [])
+    with metrics.span("chroma.query", queries=len(vectors)):
+        results = collection.query(
+            query_embeddings=vectors,
+            n_results=min((n_notes + len(exclude)) * NOTE_QUERY_OVERSAMPLE, count),
+            include=include
+        )
+    notes = []
+    position = 0
+    for group in queries:
+        best = {}
+        for row in range(position, position + len(group)):
+            for i, (id_, metadata, distance) in enumerate(zip(results['ids'][row], results['metadatas'][row], results['distances'][row])):
+                # Parçalanmadan önce eklenen notlarda parent yoktur; id notun kendisidir
+                parent = metadata.get("parent", id_)
+                if parent in exclude or (parent in best and best[parent]["distance"] <= distance):
+                    continue
+                best[parent] = {"id": parent, "metadata": metadata, "distance": distance,
+                                "document": results['documents'][row][i] if include_documents else None}
+        position += len(group)
+        notes.append(sorted(best.values(), key=lambda hit: hit["distance"])[:n_notes])
+    return notes
 
 def find_relevant_topics(current_content, top_n=3):
-    current_embedding = generate_embedding_ollama(current_content)
+    _, embeddings = embed_note(current_content)
+    embeddings = [embedding for embedding in embeddings if embedding is not None]
     
-    if current_embedding is None:
+    if not embeddings:
         return []
     
-    # Convert NumPy array to list
-    current_embedding_list = current_embedding.tolist()
-    
-    # Chroma'da benzer dokümanları ara
-    results = collection.query(
-        query_embeddings=[current_embedding_list],  # Pass as a list of lists
-        n_results=top_n,
-        include=["metadatas", "distances", "documents"]
-    )
+    # Chroma'da benzer notları ara
+    collection = get_collection()
+    hits = query_notes(collection, [embeddings], top_n, include_documents=True)[0]
     
     relevant_topics = []
-    for i in range(len(results['ids'][0])):
-        topic = results['metadatas'][0][i]['query']
-        filename = results['metadatas'][0][i]['filename']
-        similarity = 1 - results['distances'][0][i]  # Mesafeyi benzerliğe çevir
-        snippet = results['documents'][0][i][:200] + "..."  # İlk 200 karakter
+    for hit in hits:
+        topic = hit['metadata']['query']
+        filename = hit['metadata']['filename']
+        similarity = distance_to_similarity(collection, hit['distance'])  # Mesafeyi benzerliğe çevir
+        snippet = hit['document'][:200] + "..."  # En yakın parçanın ilk 200 karakteri
         relevant_topics.append({
             "topic": topic,
             "filename": filename,
@@ -154,37 +1381,101 @@ def generate_aliases(query):
     These will be used as aliases in an Obsidian note.
     Provide only the terms, each on a new line, without any additional text or formatting."""
     
-    response = chat_with_llm(prompt)
+    response = chat_with_llm(prompt, task="aliases")
     aliases = [alias.strip() for alias in response.split('\n') if alias.strip()]
     return aliases
 
+def run_section_dag(tasks, max_workers=SECTION_CONCURRENCY):
+    # tasks: {name: (fn, [dependency names])}; fn is called with the results of its dependencies
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, (fn, deps) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    running[executor.submit(fn, *[results[dep] for dep in deps])] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f"Unresolvable section dependencies: {', '.join(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
 def create_markdown_file(query, content, final_analysis, analogy, collection):
     obsidian_folder = "obsidian"
     if not os.path.exists(obsidian_folder):
         os.makedirs(obsidian_folder)
     
-    short_filename = generate_short_filename(query)
+    current_date = journal.run(query, "created", lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    preload_models_async(["summary", "analysis", "unique", "aliases", "filename", "embedding"]
+                         + (["fused"] if LLM_FUSED_SECTIONS else []))
+    full_content = content + final_analysis + analogy
+
+    # Akış modunda her bölüm üretilirken kendi dosyasına yazılır
+    section_dir = f"{STREAM_SECTION_DIR}/{re.sub(r'[^a-z0-9]+', '_', query.lower())}"
+    if LLM_STREAMING:
+        os.makedirs(section_dir, exist_ok=True)
+
+    def section(name, fn):
+        def run(*args):
+            section_stream.path = f"{section_dir}/{name}.md" if LLM_STREAMING else None
+            try:
+                with metrics.span(f"section:{name}", topic=query):
+                    return journal.run(query, f"section:{name}", fn, *args)
+            finally:
+                section_stream.path = None
+        return run
+
+    def unique_section():
+        try:
+            return generate_unique_section(query, full_content)
+        except Exception as e:
+            print(f"Error in generate_unique_section: {str(e)}")
+            return "Unique Aspect of Research", f"Error generating unique section: {str(e)}"
+
+    # Bölümler birbirinden bağımsız; yalnızca özet iki adımlı
+    tasks = {
+        "detailed_results": (section("detailed_results", lambda: beautify_detailed_results(content)), []),
+        "importance_and_connections": (section("importance_and_connections", lambda: beautify_importance_and_connections(query, content)), []),
+        "unique": (section("unique", unique_section), []),
+        "summary_draft": (section("summary_draft", lambda: generate_summary(content)), []),
+        "summary": (section("summary", beautify_summary), ["summary_draft"]),
+        "analogy": (section("analogy", lambda: beautify_analogy(analogy)), []),
+        # Parçalar bir kez gömülür; ilgili notlar sorgusu ve indeksleme önbellekteki embedding'leri kullanır
+        "relevant_docs": (section("relevant_docs", lambda embedding: generate_relevant_documents(collection, full_content)), ["embedding"]),
+        "embedding": (lambda: embed_note(full_content), []),
+        "aliases": (section("aliases", lambda: generate_aliases(query)), []),
+        "short_filename": (section("short_filename", lambda: generate_short_filename(query)), []),
+    }
+    if LLM_FUSED_SECTIONS:
+        # Aynı içeriği okuyan bölümler tek çağrıdan gelir; eksik alanlar kendi isteğine geri döner
+        def fused_or(name, fallback):
+            return lambda fused: fused[name] if name in fused else fallback()
+        del tasks["summary_draft"]
+        tasks.update({
+            "fused": (section("fused", lambda: generate_fused_sections(query, full_content)), []),
+            "detailed_results": (section("detailed_results", fused_or("detailed_results", lambda: beautify_detailed_results(content))), ["fused"]),
+            "importance_and_connections": (section("importance_and_connections", fused_or("importance_and_connections", lambda: beautify_importance_and_connections(query, content))), ["fused"]),
+            "summary": (section("summary", fused_or("summary", lambda: beautify_summary(generate_summary(content)))), ["fused"]),
+            "unique": (section("unique", fused_or("unique", unique_section)), ["fused"]),
+        })
+    sections = run_section_dag(tasks)
+
+    short_filename = sections["short_filename"]
     filename = f"{obsidian_folder}/{short_filename}.md"
-    
-    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    aliases = generate_aliases(query)
+
+    aliases = sections["aliases"]
     aliases_yaml = "---\naliases:\n" + "\n".join(f"  - {alias}" for alias in aliases) + "\n---\n\n"
     
-    relevant_docs = generate_relevant_documents(collection, content + final_analysis + analogy)
-    links = "links: " + ", ".join(relevant_docs)
-    
-    summary = beautify_summary(generate_summary(content))
-    importance_and_connections = beautify_importance_and_connections(query, content)
-    detailed_results = beautify_detailed_results(content)
-    beautified_analogy = beautify_analogy(analogy)
+    links = "links: " + ", ".join(sections["relevant_docs"])
     
-    try:
-        unique_title, unique_content = generate_unique_section(query, content + final_analysis + analogy)
-    except Exception as e:
-        print(f"Error in generate_unique_section: {str(e)}")
-        unique_title = "Unique Aspect of Research"
-        unique_content = f"Error generating unique section: {str(e)}"
+    summary = sections["summary"]
+    importance_and_connections = sections["importance_and_connections"]
+    detailed_results = sections["detailed_results"]
+    beautified_analogy = sections["analogy"]
+    unique_title, unique_content = sections["unique"]
 
     markdown_content = f"""created: {current_date}
 tags: #research #{query.replace(' ', '')}
@@ -222,22 +1513,20 @@ tags: #research #{query.replace(' ', '')}
     if "Error generating unique section" in unique_content:
         markdown_content += "\n\nNOTE: There was an error generating the unique aspect section. Please check the logs for more details.\n"
 
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(markdown_content)
+    journal.run(query, "note", write_atomic, filename, markdown_content)
+    if LLM_STREAMING:
+        shutil.rmtree(section_dir, ignore_errors=True)
     
-    # Embedding oluştur ve Chroma'ya ekle
-    embedding = generate_embedding_ollama(content + final_analysis + analogy)
-    collection.add(
-        documents=[content + final_analysis + analogy],
-        embeddings=[embedding.tolist()],
-        metadatas=[{
+    # Not parçalarını tek toplu yazımla Chroma'ya ekle
+    def add_vector():
+        index_notes(collection, [(short_filename, full_content, {
             "filename": short_filename, 
             "query": query, 
             "created": current_date, 
             "aliases": ", ".join(aliases)  # Aliases'ı string olarak ekliyoruz
-        }],
-        ids=[short_filename]
-    )
+        })])
+    journal.run(query, "vector", add_vector)
+    mark_for_linking(short_filename)
     
     return filename, short_filename
 
@@ -253,7 +1542,7 @@ def generate_short_filename(query):
 
     Filename:"""
     
-    response = chat_with_llm(prompt, max_tokens=20)
+    response = chat_with_llm(prompt, max_tokens=20, task="filename")
     
     # Clean the response
     filename = response.strip().lower()
@@ -263,6 +1552,7 @@ def generate_short_filename(query):
     return filename[:15]
 
 def generate_summary(content):
+    content = condense_context(content)
     prompt = f"""
     Summarize the following research content. Focus on:
     1. Key findings
@@ -274,7 +1564,7 @@ def generate_summary(content):
     Content to summarize:
     {content}
     """
-    return chat_with_llm(prompt)
+    return chat_with_llm(prompt, task="summary")
 
 def beautify_summary(summary):
     prompt = f"""
@@ -287,9 +1577,10 @@ def beautify_summary(summary):
     Summary to enhance:
     {summary}
     """
-    return chat_with_llm(prompt)
+    return chat_with_llm(prompt, task="summary")
 
 def beautify_importance_and_connections(query, content):
+    content = condense_context(content)
     prompt = f"""
     Analyze the following research content on "{query}" and create a detailed section about its importance and connections:
 
@@ -319,9 +1610,10 @@ def beautify_importance_and_connections(query, content):
     Content to analyze:
     {content}
     """
-    return chat_with_llm(prompt)
+    return chat_with_llm(prompt, task="analysis")
 
 def beautify_detailed_results(content):
+    content = condense_context(content)
     prompt = f"""
     Structure and enhance the following detailed research results:
     1. Use headers (##) for main topics
@@ -334,7 +1626,7 @@ def beautify_detailed_results(content):
     Content to structure:
     {content}
     """
-    return chat_with_llm(prompt)
+    return chat_with_llm(prompt, task="analysis")
 
 def beautify_analogy(analogy):
     prompt = f"""
@@ -347,31 +1639,128 @@ def beautify_analogy(analogy):
     Analogy to enhance:
     {analogy}
     """
-    return chat_with_llm(prompt)
+    return chat_with_llm(prompt, task="analysis")
+
+def generate_fused_sections(query, full_content):
+    full_content = condense_context(full_content)
+    prompt = f"""
+    Based on the following research content about "{query}", write these note sections as Markdown strings
+    in a single JSON object:
+
+    - "summary": key findings, main themes and significant insights as bullet points, with bold important
+      concepts and a brief introduction and conclusion.
+    - "importance_and_connections": why this research on "{query}" is significant, what each source
+      (Google, Arxiv, Wikipedia) contributes, how the sources relate to each other, and a brief synthesis.
+    - "detailed_results": the research results structured with headers (##), subheaders (###), lists,
+      bold important terms and blockquotes (>) for significant findings.
+    - "unique_title": a creative and engaging title for the most interesting or unexpected aspect of the topic.
+    - "unique_content": 2-3 paragraphs exploring that aspect, relating it back to "{query}" and discussing
+      future implications where applicable.
+
+    Research content:
+    {full_content}
+    """
+    try:
+        result = ollama_generate(prompt, task="fused", format=FUSED_SECTIONS_SCHEMA)
+        data = json.loads(result)
+    except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+        print(f"Fused section generation failed, generating sections separately: {str(e)}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    # Yalnızca dolu metin alanları kabul edilir; geri kalanlar ayrı ayrı üretilir
+    fields = {name: data[name].strip() for name in FUSED_SECTIONS_SCHEMA["properties"]
+              if isinstance(data.get(name), str) and data[name].strip()}
+    sections = {name: fields[name] for name in ("summary", "importance_and_connections", "detailed_results") if name in fields}
+    if "unique_title" in fields and "unique_content" in fields and "\n" not in fields["unique_title"]:
+        sections["unique"] = [fields["unique_title"], fields["unique_content"]]
+    missing = [name for name in ("summary", "importance_and_connections", "detailed_results", "unique") if name not in sections]
+    if missing:
+        print(f"Fused generation left {', '.join(missing)} empty; generating separately.")
+    return sections
 
 def generate_relevant_documents(collection, current_content, top_n=3):
-    current_embedding = generate_embedding_ollama(current_content)
+    _, embeddings = embed_note(current_content)
+    embeddings = [embedding for embedding in embeddings if embedding is not None]
     
-    if current_embedding is None:
+    if not embeddings:
         return []
     
-    current_embedding_list = current_embedding.tolist()
-    
-    results = collection.query(
-        query_embeddings=[current_embedding_list],
-        n_results=top_n,
-        include=["metadatas", "distances"]
-    )
-    
     relevant_docs = []
-    for i in range(len(results['ids'][0])):
-        filename = results['metadatas'][0][i]['filename']
-        query = results['metadatas'][0][i]['query']
-        similarity = 1 - results['distances'][0][i]  # Mesafeyi benzerliğe çevir
+    for hit in query_notes(collection, [embeddings], top_n)[0]:
+        filename = hit['metadata']['filename']
+        query = hit['metadata']['query']
         relevant_docs.append(f"[[{filename}|{query}]]")
     
     return relevant_docs
 
+backlinks_lock = threading.Lock()
+
+def mark_for_linking(note_id):
+    with backlinks_lock:
+        with open(BACKLINKS_PENDING_FILE, "a", encoding="utf-8") as f:
+            f.write(note_id + "\n")
+
+def add_note_links(note_id, new_links):
+    # Yalnızca front matter'daki links: satırı yeniden yazılır; notun geri kalanına dokunulmaz
+    path = f"obsidian/{note_id}.md"
+    if not os.path.exists(path):
+        return False
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    match = re.search(r'^links:(.*)$', text, re.MULTILINE)
+    if match is None:
+        return False
+    links = re.findall(r'\[\[[^\]]+\]\]', match.group(1))
+    known = {link[2:-2].split("|")[0] for link in links} | {note_id}
+    added = []
+    for target, link in new_links:
+        if target not in known and len(links) + len(added) < BACKLINKS_MAX_LINKS:
+            known.add(target)
+            added.append(link)
+    if not added:
+        return False
+    write_atomic(path, text[:match.start()] + "links: " + ", ".join(links + added) + text[match.end():])
+    return True
+
+def update_backlinks(collection=None, top_n=BACKLINKS_TOP_N):
+    processing = f"{BACKLINKS_PENDING_FILE}.processing"
+    with backlinks_lock:
+        # Geçiş sırasında eklenen notlar bir sonraki geçişe kalır; yarıda kalan geçişin listesi korunur
+        if os.path.exists(BACKLINKS_PENDING_FILE):
+            with open(BACKLINKS_PENDING_FILE, "r", encoding="utf-8") as f:
+                pending = f.read()
+            with open(processing, "a", encoding="utf-8") as f:
+                f.write(pending)
+            os.remove(BACKLINKS_PENDING_FILE)
+    if not os.path.exists(processing):
+        return 0
+    with open(processing, "r", encoding="utf-8") as f:
+        note_ids = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+    collection = collection or get_collection()
+    stored = collection.get(where={"parent": {"$in": note_ids}}, include=["embeddings", "metadatas"])
+    groups, parents = {}, {}
+    for embedding, metadata in zip(stored["embeddings"], stored["metadatas"]):
+        groups.setdefault(metadata["parent"], []).append(embedding)
+        parents[metadata["parent"]] = metadata
+    updated = 0
+    if groups:
+        # Tüm yeni notların parçaları tek toplu sorguda aranır; +1 notun kendisi için
+        results = query_notes(collection, list(groups.values()), top_n + 1)
+        additions = {}
+        for note_id, note_hits in zip(groups, results):
+            metadata = parents[note_id]
+            for hit in [hit for hit in note_hits if hit["id"] != note_id][:top_n]:
+                # İlişki iki yönlü yazılır: eski notlar da yeni komşularını öğrenir
+                additions.setdefault(note_id, []).append((hit["id"], f"[[{hit['metadata']['filename']}|{hit['metadata']['query']}]]"))
+                additions.setdefault(hit["id"], []).append((note_id, f"[[{metadata['filename']}|{metadata['query']}]]"))
+        updated = sum(add_note_links(note_id, links) for note_id, links in additions.items())
+    os.remove(processing)
+    print(f"Backlinks: {len(note_ids)} new note(s), {updated} file(s) updated.")
+    return updated
+
 def extract_relevant_words(filename, original_query):
     with open(filename, "r", encoding="utf-8") as f:
         content = f.read()
@@ -388,7 +1777,7 @@ def extract_relevant_words(filename, original_query):
     Concepts and selection:
     """
     
-    response = chat_with_llm(prompt)
+    response = chat_with_llm(prompt, task="concepts")
     
     # Extract concepts and selected concept
     concepts = re.findall(r'\[\[(.*?)\]\]', response)
@@ -404,7 +1793,7 @@ def extract_relevant_words(filename, original_query):
 
         Concepts and selection:
         """
-        new_response = chat_with_llm(new_prompt)
+        new_response = chat_with_llm(new_prompt, task="concepts")
         concepts = re.findall(r'\[\[(.*?)\]\]', new_response)
         selected_line = [line for line in new_response.split('\n') if line.strip().startswith("Selected concept:")]
     
@@ -428,14 +1817,16 @@ def extract_relevant_words(filename, original_query):
     
     return concepts, selected_concept
 
-def save_checkpoint(current_query, iteration, researched_topics, auto_continue, max_iterations):
+def save_checkpoint(current_query, iteration, auto_continue, max_iterations, frontier=None):
+    # Araştırılmış konular topic_index'te kalıcı olarak tutulur
     checkpoint = {
         "current_query": current_query,
         "iteration": iteration,
-        "researched_topics": researched_topics,
         "auto_continue": auto_continue,
         "max_iterations": max_iterations
     }
+    if frontier is not None:
+        checkpoint["frontier"] = frontier.snapshot()
     with open(CHECKPOINT_FILE, "w") as f:
         json.dump(checkpoint, f)
 
@@ -446,27 +1837,269 @@ def load_checkpoint():
     except FileNotFoundError:
         return None
 
+class StageJournal:
+    # Ekleme yapılan JSONL günlüğü: {"topic", "stage", "output"}; "done" kaydı konunun kayıtlarını geçersiz kılar
+    def __init__(self, path):
+        self.path = path
+        self.stages = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        if self.stages is None:
+            self.stages = {}
+            if os.path.exists(self.path):
+                end = 0
+                with open(self.path, "rb") as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # Kesinti sırasında yarım kalmış son satır
+                        try:
+                            record = json.loads(line)
+                        except (json.JSONDecodeError, UnicodeDecodeError):
+                            break
+                        end = f.tell()
+                        if record["stage"] == "done":
+                            self.stages.pop(record["topic"], None)
+                        else:
+                            self.stages.setdefault(record["topic"], {})[record["stage"]] = record["output"]
+                # Yarım satır atılır; yoksa sonraki eklemeler onun arkasına yazılır ve bir sonraki okumada kaybolur
+                NumpyVectorStore.truncate(self.path, end)
+        return self.stages
+
+    def append(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, topic, stage, fn, *args):
+        key = topic.lower()
+        with self.lock:
+            stages = self.load().get(key, {})
+            if stage in stages:
+                return stages[stage]
+        output = fn(*args)
+        # LLM hata metinleri kaydedilmez ki devam ederken yeniden denensin
+        if isinstance(output, str) and output.startswith("Error communicating with LLM"):
+            return output
+        with self.lock:
+            self.load().setdefault(key, {})[stage] = output
+            self.append({"topic": key, "stage": stage, "output": output})
+        return output
+
+    def complete(self, topic):
+        with self.lock:
+            self.load().pop(topic.lower(), None)
+            self.append({"topic": topic.lower(), "stage": "done", "output": None})
+            if os.path.getsize(self.path) > JOURNAL_COMPACT_BYTES:
+                self.compact()
+
+    def compact(self):
+        # Yalnızca tamamlanmamış konuların kayıtlarını tutarak günlüğü yeniden yaz
+        records = [json.dumps({"topic": topic, "stage": stage, "output": output}, ensure_ascii=False)
+                   for topic, stages in self.stages.items() for stage, output in stages.items()]
+        write_atomic(self.path, "".join(f"{record}\n" for record in records))
+
+    def clear(self):
+        with self.lock:
+            self.stages = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+journal = StageJournal(JOURNAL_FILE)
+
+class TopicIndex:
+    # "Daha önce araştırıldı mı?" sorusu için SQLite tabanlı sözlük benzeri dizin
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("CREATE TABLE IF NOT EXISTS topics (key TEXT PRIMARY KEY, filename TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            if conn.execute("SELECT 1 FROM meta WHERE name = 'imported'").fetchone() is None:
+                self.import_collection(conn)
+            self.conn = conn
+        return self.conn
+
+    def import_collection(self, conn):
+        # Yalnızca metadata, sayfa sayfa okunur; belgeler belleğe alınmaz
+        offset = 0
+        while True:
+            page = get_collection().get(include=["metadatas"], limit=TOPIC_INDEX_PAGE_SIZE, offset=offset)
+            metadatas = page['metadatas'] or []
+            conn.executemany("INSERT OR REPLACE INTO topics VALUES (?, ?)",
+                             [(metadata['query'].lower(), metadata['filename']) for metadata in metadatas])
+            if len(metadatas) < TOPIC_INDEX_PAGE_SIZE:
+                break
+            offset += TOPIC_INDEX_PAGE_SIZE
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('imported', ?)", (datetime.now().isoformat(),))
+        conn.commit()
+
+    def __contains__(self, key):
+        with self.lock:
+            return self.connect().execute("SELECT 1 FROM topics WHERE key = ?", (key.lower(),)).fetchone() is not None
+
+    def __getitem__(self, key):
+        with self.lock:
+            row = self.connect().execute("SELECT filename FROM topics WHERE key = ?", (key.lower(),)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __setitem__(self, key, filename):
+        with self.lock:
+            conn = self.connect()
+            conn.execute("INSERT OR REPLACE INTO topics VALUES (?, ?)", (key.lower(), filename))
+            conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.connect().execute("SELECT COUNT(*) FROM topics").fetchone()[0]
+
+topic_index = TopicIndex(TOPIC_INDEX_FILE)
+
 def signal_handler(sig, frame):
     print("\nProgram durduruluyor. İlerleme kaydediliyor...")
-    save_checkpoint(current_query, iteration, researched_topics, auto_continue, max_iterations)
+    save_checkpoint(current_query, iteration, auto_continue, max_iterations, frontier)
     sys.exit(0)
 
+class ArxivClient:
+    def __init__(self, min_interval=ARXIV_MIN_INTERVAL, batch_window=ARXIV_BATCH_WINDOW, batch_max=ARXIV_BATCH_MAX):
+        self.min_interval = min_interval
+        self.batch_window = batch_window
+        self.batch_max = batch_max
+        self.lock = threading.Lock()
+        self.rate_lock = threading.Lock()
+        self.last_request = 0.0
+        self.pending = []
+        self.batch_full = threading.Event()
+
+    def cached_results(self, query, max_results):
+        cached = source_cache.get(cache_key("arxiv", query, max_results))
+        entry = json.loads(cached) if cached is not None else None
+        if not entry or "ids" not in entry:
+            return None
+        if not SOURCE_OFFLINE and time.time() - entry["fetched"] >= SOURCE_CACHE_TTLS["arxiv"]:
+            return None
+        results = [self.cached_entry(arxiv_id) for arxiv_id in entry["ids"]]
+        return [result for result in results if result] if all(results) or SOURCE_OFFLINE else None
+
+    def cached_entry(self, arxiv_id):
+        cached = source_cache.get(cache_key("arxiv-entry", arxiv_id))
+        return json.loads(cached) if cached is not None else None
+
+    def search(self, query, max_results=5):
+        results = self.cached_results(query, max_results)
+        if results is not None:
+            record_source_cache("fresh")
+            return results
+        if SOURCE_OFFLINE:
+            record_source_cache("offline_misses")
+            return []
+
+        # İlk gelen istek pencere boyunca bekleyip birikenleri tek istekte gönderir; diğerleri sonucu bekler
+        request = {"query": query, "max_results": max_results, "done": threading.Event(), "results": None, "error": None}
+        with self.lock:
+            self.pending.append(request)
+            leader = len(self.pending) == 1
+            if len(self.pending) >= self.batch_max:
+                self.batch_full.set()
+        if leader:
+            self.batch_full.wait(self.batch_window)
+            with self.lock:
+                batch, self.pending = self.pending, []
+                self.batch_full.clear()
+            for start in range(0, len(batch), self.batch_max):
+                self.run_batch(batch[start:start + self.batch_max])
+        request["done"].wait()
+        if request["error"] is not None:
+            raise request["error"]
+        return request["results"]
+
+    def run_batch(self, batch):
+        try:
+            found = self.fetch({request["query"]: request["max_results"] for request in batch})
+            for request in batch:
+                request["results"] = found[request["query"]][:request["max_results"]]
+        except Exception as e:
+            for request in batch:
+                request["error"] = e
+        finally:
+            for request in batch:
+                request["done"].set()
+
+    def throttle(self):
+        with self.rate_lock:
+            delay = self.last_request + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.last_request = time.monotonic()
+
+    @staticmethod
+    def terms(query):
+        return re.findall(r'\w+', query.lower())
+
+    def request(self, search_query, max_results):
+        self.throttle()
+        params = {"search_query": search_query, "start": 0, "max_results": max_results,
+                  "sortBy": "relevance", "sortOrder": "descending"}
+        response = http_request("GET", ARXIV_API_URL.format(urlencode(params)))
+        response.raise_for_status()
+        entries = []
+        for item in ElementTree.fromstring(response.content).findall("atom:entry", ARXIV_NAMESPACE):
+            arxiv_id = re.sub(r'v\d+$', '', (item.findtext("atom:id", "", ARXIV_NAMESPACE)).split("/abs/")[-1])
+            entry = {
+                "id": arxiv_id,
+                "title": " ".join(item.findtext("atom:title", "", ARXIV_NAMESPACE).split()),
+                "summary": " ".join(item.findtext("atom:summary", "", ARXIV_NAMESPACE).split()),
+                "published": item.findtext("atom:published", "", ARXIV_NAMESPACE),
+            }
+            entries.append(entry)
+        source_cache.set_many([(cache_key("arxiv-entry", entry["id"]), json.dumps(entry)) for entry in entries])
+        record_source_cache("fetched")
+        return entries
+
+    def fetch(self, queries):
+        # Her konu "tüm terimler" koşuludur; konular OR ile birleştirilir, sonuçlar terim eşleşmesiyle konulara dağıtılır
+        clauses = {query: " AND ".join(f"all:{term}" for term in self.terms(query)) for query in queries}
+        clauses = {query: clause for query, clause in clauses.items() if clause}
+        found = {query: [] for query in queries}
+        if len(clauses) == 1:
+            query, clause = next(iter(clauses.items()))
+            found[query] = self.request(clause, queries[query])
+        elif clauses:
+            entries = self.request(" OR ".join(f"({clause})" for clause in clauses.values()),
+                                   sum(queries[query] for query in clauses) * ARXIV_BATCH_OVERSAMPLE)
+            for query in clauses:
+                terms = self.terms(query)
+                found[query] = [entry for entry in entries
+                                if all(term in f"{entry['title']} {entry['summary']}".lower() for term in terms)][:queries[query]]
+            # Birleşik sonuçlarda payı çıkmayan konular tek başına sorgulanır
+            for query in clauses:
+                if not found[query]:
+                    found[query] = self.request(clauses[query], queries[query])
+        for query, entries in found.items():
+            source_cache.set(cache_key("arxiv", query, queries[query]),
+                             json.dumps({"fetched": time.time(), "ids": [entry["id"] for entry in entries]}))
+        return found
+
+arxiv_client = ArxivClient()
+
 def arxiv_search(query, max_results=5):
-    client = arxiv.Client()
-    search = arxiv.Search(
-        query = query,
-        max_results = max_results,
-        sort_by = arxiv.SortCriterion.Relevance
-    )
     results = []
-    for result in client.results(search):
+    for entry in arxiv_client.search(query, max_results):
         results.append({
-            'title': result.title,
-            'summary': result.summary[:200] + "..."  # İlk 200 karakter
+            'title': entry['title'],
+            'summary': entry['summary'][:200] + "..."  # Prompt için ilk 200 karakter; tam özet önbellekte
         })
     return results
 
 def generate_unique_section(query, full_content):
+    full_content = condense_context(full_content)
     prompt = f"""
     Based on the following research content about "{query}", generate a unique section that highlights 
     the most interesting or unexpected aspect of this topic. This section should:
@@ -484,16 +2117,9 @@ def generate_unique_section(query, full_content):
     {full_content}
     """
     
+    result = ""
     try:
-        response = requests.post(f"{OLLAMA_URL}/api/generate", json={
-            "model": "mistral-nemo",
-            "prompt": prompt,
-            "stream": False,
-            "options": {"num_ctx": 4096}
-        })
-        response.raise_for_status()
-        
-        result = response.json()['response']
+        result = ollama_generate(prompt, task="unique")
         
         # Daha sağlam bir ayrıştırma yöntemi
         if "TITLE:" in result and "CONTENT:" in result:
@@ -509,8 +2135,298 @@ def generate_unique_section(query, full_content):
         print(f"Error in generate_unique_section: {str(e)}")
         return "Unique Aspect of Research", f"Error generating unique section: {str(e)}\n\nFull response:\n{result}"
 
+def distance_to_similarity(collection, distance):
+    # Embedding'ler birim uzunlukta; l2 (Chroma varsayılanı) karesel uzaklık 2 - 2cos'tur
+    space = (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
+    return 1 - distance / 2 if space == "l2" else 1 - distance
+
+def rank_candidates(candidates, researched_topics, exclude_ids=()):
+    # Adaylar tek toplu istekle gömülür; her biri için mevcut notlara en yüksek benzerlik döner
+    unique = []
+    for candidate in candidates:
+        candidate = candidate.strip() if candidate else ""
+        if candidate and candidate.lower() not in researched_topics and candidate.lower() not in [c.lower() for c in unique]:
+            unique.append(candidate)
+    if not unique:
+        return []
+
+    embeddings = generate_embeddings_ollama(unique)
+    valid = [(candidate, embedding) for candidate, embedding in zip(unique, embeddings) if embedding is not None]
+    collection = get_collection()
+    similarities = {}
+    if valid:
+        results = query_notes(collection, [[embedding] for _, embedding in valid], 1, exclude=tuple(exclude_ids))
+        for (candidate, _), hits in zip(valid, results):
+            similarities[candidate] = max((distance_to_similarity(collection, hit["distance"]) for hit in hits), default=0.0)
+    return [(candidate, similarities.get(candidate, 0.0)) for candidate in unique]
+
+def select_next_topic(current_query, candidates, researched_topics, exclude_ids=()):
+    ranked = rank_candidates(candidates, researched_topics, exclude_ids)
+    for candidate, similarity in ranked:
+        if similarity < NOVELTY_THRESHOLD:
+            return candidate
+        print(f"'{candidate}' is too similar to an existing note ({similarity:.2f}). Trying the next option...")
+
+    # Uygun aday yoksa tek bir üretimle yeni adaylar iste
+    print("No new topics to research. Generating new candidates...")
+    avoid = ", ".join([current_query] + [candidate for candidate, _ in ranked])
+    prompt = f"""Suggest 5 research topics related to '{current_query}' that are clearly different from: {avoid}.
+    Keep each topic under 20 characters. Provide only the topics, each on a new line."""
+    response = chat_with_llm(prompt, task="concepts")
+    if response.startswith("Error communicating with LLM"):
+        extra = []
+    else:
+        extra = [strip_list_marker(line)[:20] for line in response.split('\n') if line.strip()]
+    ranked += rank_candidates(extra, researched_topics, exclude_ids)
+    if not ranked:
+        return None
+    # Hepsi eşiğin üzerindeyse en az benzer olanı seç
+    return min(ranked, key=lambda item: item[1])[0]
+
+def summary_prompt(all_results):
+    return f"Summarize the following search results and extract key points:\n\n{condense_context(all_results)}"
+
+class Prefetcher:
+    def __init__(self, max_topics=PREFETCH_TOPICS, warm_topics=PREFETCH_WARM_TOPICS, max_bytes=PREFETCH_MAX_BYTES):
+        self.max_topics = max_topics
+        self.warm_topics = warm_topics
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.jobs = {}
+        self.executor = None
+        self.lock = threading.Lock()
+        self.stats = {"used": 0, "discarded": 0, "over_budget": 0}
+
+    def prefetch(self, topics):
+        # Sıra olasılığa göre: ilk konu seçilen sonraki konudur
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+            for rank, topic in enumerate(list(dict.fromkeys(t for t in topics if t))[:self.max_topics]):
+                if topic.lower() in self.jobs:
+                    continue
+                job = {"cancel": threading.Event(), "bytes": 0}
+                job["future"] = self.executor.submit(self.run, topic, job, rank < self.warm_topics)
+                self.jobs[topic.lower()] = job
+
+    def run(self, topic, job, warm):
+        if job["cancel"].is_set():
+            return None
+        with ollama_scheduler.background(LLM_PRIORITIES["prefetch"]):
+            all_results = gather_sources(topic)
+            size = len(all_results.encode("utf-8"))
+            with self.lock:
+                if job["cancel"].is_set():
+                    return None
+                if self.used_bytes + size > self.max_bytes:
+                    self.stats["over_budget"] += 1
+                    return None
+                self.used_bytes += size
+                job["bytes"] = size
+            if warm and not job["cancel"].is_set():
+                # Sonuçlar LLM ve embedding önbelleklerine girer; araştırma başlayınca aynı istekler önbellekten döner.
+                # Kaynak metnin tamamen içinde kalan parçalar notun ilk parçalarıyla aynıdır.
+                chat_with_llm(summary_prompt(all_results), task="summary")
+            if warm and not job["cancel"].is_set():
+                generate_embeddings_ollama(chunk_note(all_results)[:-1])
+        return all_results
+
+    def take(self, topic):
+        with self.lock:
+            job = self.jobs.pop(topic.lower(), None)
+        if job is not None:
+            try:
+                # Hâlâ çalışıyorsa yeniden başlatmak yerine bitmesini bekle
+                all_results = job["future"].result()
+            except Exception as e:
+                print(f"Prefetch for '{topic}' failed: {str(e)}")
+                all_results = None
+            with self.lock:
+                self.used_bytes -= job["bytes"]
+            if all_results is not None:
+                self.stats["used"] += 1
+                print(f"Using prefetched sources for '{topic}'.")
+                return all_results
+        return gather_sources(topic)
+
+    def cancel(self, keep=()):
+        keep = {topic.lower() for topic in keep}
+        with self.lock:
+            for key in [key for key in self.jobs if key not in keep]:
+                job = self.jobs.pop(key)
+                job["cancel"].set()
+                job["future"].cancel()
+                self.used_bytes -= job["bytes"]
+                self.stats["discarded"] += 1
+
+    def shutdown(self):
+        self.cancel()
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+    def format_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        return f"{stats['used']} used, {stats['discarded']} discarded, {stats['over_budget']} over memory budget"
+
+prefetcher = Prefetcher()
+
+def research_topic(query):
+    summaries = []
+    # Kaynaklar toplanırken sonraki aşamaların modelleri yüklenir
+    preload_models_async(["concepts", "condense", "summary", "analysis"])
+
+    # Google, Arxiv ve Wikipedia kaynaklarını eşzamanlı topla
+    with metrics.span("sources", topic=query):
+        all_results = journal.run(query, "sources", prefetcher.take, query)
+
+    # Summary of all results
+    # İstemler lambda içinde kurulur; aşama günlükteyse (devam edilen çalışma) sıkıştırma LLM çağrıları yapılmaz
+    with metrics.span("summary", topic=query):
+        summary = journal.run(query, "summary", lambda: chat_with_llm(summary_prompt(all_results), task="summary"))
+    summaries.append(summary)
+    all_results += f"\nSummary:\n{summary}\n\n"
+
+    # Final analysis
+    with metrics.span("final_analysis", topic=query):
+        final_analysis = journal.run(query, "final_analysis", lambda: chat_with_llm(
+            f"Analyze all the following search results and summaries, and create a comprehensive report:\n\n{condense_context(all_results)}",
+            task="analysis"))
+
+    # Create analogy
+    analogy_prompt = f"Create an interesting and explanatory analogy for the topic '{query}'."
+    with metrics.span("analogy", topic=query):
+        analogy = journal.run(query, "analogy", lambda: chat_with_llm(analogy_prompt, task="analysis"))
+
+    # Create Markdown file
+    try:
+        filename, short_filename = create_markdown_file(query, all_results, final_analysis, analogy, get_collection())
+        print(f"\nResearch results and analysis have been saved in '{filename}'.")
+    except Exception as e:
+        print(f"Error creating Markdown file: {str(e)}")
+        filename = f"error_{query.replace(' ', '_')}.md"
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(f"Error occurred while creating file for {query}:\n{str(e)}")
+        print(f"Error details have been saved in '{filename}'.")
+        short_filename = filename
+
+    metrics.write_prometheus()
+    return filename, short_filename
+
+class ResearchFrontier:
+    # Aday konuların öncelik kuyruğu; (derinlik, sıra) küçük olan önce araştırılır
+    def __init__(self, researched_topics, max_depth=FRONTIER_MAX_DEPTH, max_breadth=FRONTIER_MAX_BREADTH):
+        self.researched_topics = researched_topics
+        self.max_depth = max_depth
+        self.max_breadth = max_breadth
+        self.heap = []
+        self.queued = set()
+        self.in_progress = {}
+        self.failed = set()
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def push(self, topic, depth, rank=0):
+        key = topic.lower()
+        with self.lock:
+            if (depth > self.max_depth or key in self.researched_topics
+                    or key in self.queued or key in self.in_progress or key in self.failed):
+                return False
+            heapq.heappush(self.heap, (depth, rank, self.counter, topic))
+            self.counter += 1
+            self.queued.add(key)
+            return True
+
+    def push_concepts(self, concepts, depth):
+        for rank, concept in enumerate(concepts[:self.max_breadth]):
+            self.push(concept, depth, rank)
+
+    def claim(self):
+        # Kuyruktan alma ve "araştırılıyor" olarak işaretleme tek kilit altında yapılır
+        with self.lock:
+            while self.heap:
+                depth, _, _, topic = heapq.heappop(self.heap)
+                key = topic.lower()
+                self.queued.discard(key)
+                if key in self.researched_topics or key in self.in_progress:
+                    continue
+                self.in_progress[key] = (topic, depth)
+                return topic, depth
+            return None
+
+    def complete(self, topic, short_filename):
+        with self.lock:
+            self.in_progress.pop(topic.lower(), None)
+            self.researched_topics[topic.lower()] = short_filename
+
+    def fail(self, topic):
+        # Hata veren konu bu çalıştırmada tekrar kuyruğa alınmaz
+        with self.lock:
+            self.in_progress.pop(topic.lower(), None)
+            self.failed.add(topic.lower())
+
+    def snapshot(self):
+        with self.lock:
+            pending = [[topic, depth] for topic, depth in self.in_progress.values()]
+            return pending + [[topic, depth] for depth, _, _, topic in sorted(self.heap)]
+
+def research_and_expand(query):
+    filename, short_filename = research_topic(query)
+    with metrics.span("concepts", topic=query):
+        concepts, selected_concept = journal.run(query, "concepts", extract_relevant_words, filename, query)
+    print(f"Generated concepts for '{query}': {', '.join(concepts)}")
+    return short_filename, concepts, selected_concept
+
+def crawl_frontier(frontier, max_iterations, workers=FRONTIER_WORKERS):
+    global current_query, iteration
+    running = {}
+    last_topic = current_query
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while len(running) < workers and iteration + len(running) < max_iterations:
+                claimed = frontier.claim()
+                if not claimed:
+                    break
+                topic, depth = claimed
+                current_query = topic
+                print(f"\nİterasyon {iteration + len(running) + 1}: '{topic}' araştırılıyor (derinlik {depth})")
+                running[executor.submit(research_and_expand, topic)] = (topic, depth)
+
+            if not running:
+                if iteration >= max_iterations:
+                    break
+                # Kuyruk boşaldı; bir kez yeni konu önerisi iste
+                print("No new topics to research. Generating a new topic...")
+                next_query = select_next_topic(last_topic, [], frontier.researched_topics)
+                if not next_query or not frontier.push(next_query, 0):
+                    break
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                topic, depth = running.pop(future)
+                try:
+                    short_filename, concepts, selected_concept = future.result()
+                except Exception as e:
+                    # Tek bir konudaki hata taramayı durdurmaz; iterasyon harcanmış sayılır
+                    print(f"Error researching '{topic}': {str(e)}. Skipping.")
+                    frontier.fail(topic)
+                    iteration += 1
+                    save_checkpoint(current_query, iteration, True, max_iterations, frontier)
+                    continue
+                frontier.complete(topic, short_filename)
+                # Mevcut notlara çok benzeyen kavramlar kuyruğa alınmaz
+                ranked = rank_candidates([selected_concept] + concepts, frontier.researched_topics, [short_filename])
+                frontier.push_concepts([concept for concept, similarity in ranked if similarity < NOVELTY_THRESHOLD], depth + 1)
+                last_topic = topic
+                iteration += 1
+                save_checkpoint(current_query, iteration, True, max_iterations, frontier)
+                journal.complete(topic)
+
 def main():
-    global current_query, iteration, researched_topics
+    global current_query, iteration, researched_topics, auto_continue, max_iterations, frontier
 
     signal.signal(signal.SIGINT, signal_handler)
 
@@ -520,12 +2436,16 @@ def main():
         if input().lower() == 'e':
             current_query = checkpoint["current_query"]
             iteration = checkpoint["iteration"]
-            researched_topics = checkpoint["researched_topics"]
+            researched_topics = topic_index
+            # Eski biçimdeki checkpoint'lerin konu listesini dizine aktar
+            for topic, filename in checkpoint.get("researched_topics", {}).items():
+                researched_topics[topic] = filename
             auto_continue = checkpoint.get("auto_continue", False)
             max_iterations = checkpoint.get("max_iterations", 10)
             print(f"Araştırma '{current_query}' konusundan ve {iteration}. iterasyondan devam ediyor.")
         else:
             os.remove(CHECKPOINT_FILE)
+            journal.clear()
             checkpoint = None
     
     if not checkpoint:
@@ -535,121 +2455,356 @@ def main():
         
         current_query = initial_query
         iteration = 0
-        researched_topics = {}
-        # Chroma'dan mevcut konuları al
-        all_metadatas = collection.get()['metadatas']
-        for metadata in all_metadatas:
-            researched_topics[metadata['query'].lower()] = metadata['filename']
+        researched_topics = topic_index
         
         # İlk verilen kelime için kontrol
         if current_query.lower() in researched_topics:
             print(f"'{current_query}' daha önce araştırılmış. Yeni bir konu öneriliyor...")
-            new_topic_prompt = f"Suggest a related but different topic to '{current_query}' that hasn't been researched yet. Keep it under 20 characters."
-            current_query = chat_with_llm(new_topic_prompt).strip()[:20]
-            while current_query.lower() in researched_topics:
-                print(f"'{current_query}' de daha önce araştırılmış. Başka bir konu öneriliyor...")
-                new_topic_prompt = f"Suggest a different topic that hasn't been researched yet. Keep it under 20 characters."
-                current_query = chat_with_llm(new_topic_prompt).strip()[:20]
+            current_query = select_next_topic(current_query, [], researched_topics)
+            if not current_query:
+                print("Araştırılmamış yeni bir konu bulunamadı.")
+                return
             print(f"Yeni araştırma konusu: {current_query}")
     else:
-        if 'max_iterations' not in locals():
+        if max_iterations is None:
             max_iterations = int(input("Maksimum araştırma iterasyon sayısını girin: "))
 
-    while iteration < max_iterations:
+    if auto_continue and FRONTIER_WORKERS > 1:
+        # Otomatik modda birden fazla konu paralel, genişlik öncelikli araştırılır
+        frontier = ResearchFrontier(researched_topics)
+        for topic, depth in (checkpoint or {}).get("frontier") or [[current_query, 0]]:
+            frontier.push(topic, depth)
+        crawl_frontier(frontier, max_iterations)
+
+    while frontier is None and iteration < max_iterations:
         print(f"\nİterasyon {iteration + 1}: '{current_query}' araştırılıyor")
         
-        all_results = ""
-        summaries = []
-
-        # Google search
-        search_results = internet_search(current_query, num_results=5)
-        all_results += "Google Search Results:\n"
-        for i, result in enumerate(search_results, 1):
-            all_results += f"Result {i}: {result[:200]}...\n"
-        
-        # Arxiv search
-        arxiv_results = arxiv_search(current_query, max_results=5)
-        all_results += "\nArxiv Search Results:\n"
-        for i, result in enumerate(arxiv_results, 1):
-            all_results += f"Result {i}: {result['title']} - {result['summary']}\n"
-
-        # Wikipedia search
-        wiki_topics = get_wikipedia_topics(current_query)
-        all_results += "\nWikipedia Search Results:\n"
-        for topic in wiki_topics:
-            wiki_results = wikipedia_search(topic)
-            if isinstance(wiki_results, dict):
-                for lang, result in wiki_results.items():
-                    all_results += f"{topic} ({lang.upper()}): {result}\n"
-            else:
-                all_results += f"{topic}: {wiki_results}\n"
-
-        # Summary of all results
-        prompt_summary = f"Summarize the following search results and extract key points:\n\n{all_results}"
-        summary = chat_with_llm(prompt_summary)
-        summaries.append(summary)
-        all_results += f"\nSummary:\n{summary}\n\n"
-
-        # Final analysis
-        final_prompt = f"Analyze all the following search results and summaries, and create a comprehensive report:\n\n{all_results}"
-        final_analysis = chat_with_llm(final_prompt)
-
-        # Create analogy
-        analogy_prompt = f"Create an interesting and explanatory analogy for the topic '{current_query}'."
-        analogy = chat_with_llm(analogy_prompt)
-
-        # Create Markdown file
-        try:
-            filename, short_filename = create_markdown_file(current_query, all_results, final_analysis, analogy, collection)
-            print(f"\nResearch results and analysis have been saved in '{filename}'.")
-        except Exception as e:
-            print(f"Error creating Markdown file: {str(e)}")
-            filename = f"error_{current_query.replace(' ', '_')}.md"
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(f"Error occurred while creating file for {current_query}:\n{str(e)}")
-            print(f"Error details have been saved in '{filename}'.")
-            short_filename = filename
+        filename, short_filename = research_topic(current_query)
 
         # Add the current query to researched topics (case-insensitive)
         researched_topics[current_query.lower()] = short_filename
 
         # Extract relevant concepts and select the next query
-        concepts, next_query = extract_relevant_words(filename, current_query)
+        with metrics.span("concepts", topic=current_query):
+            concepts, next_query = journal.run(current_query, "concepts", extract_relevant_words, filename, current_query)
         
         print(f"Generated concepts: {', '.join(concepts)}")
         print(f"Selected concept for next iteration: {next_query}")
         
-        # Check if the next query has already been researched (case-insensitive)
-        while next_query.lower() in researched_topics and concepts:
-            print(f"'{next_query}' has already been researched. Trying the next option...")
-            concepts.remove(next_query)
-            next_query = concepts[0] if concepts else None
-
+        # Adayları mevcut notlara göre yenilik açısından değerlendir (en fazla bir ek üretim)
+        next_query = select_next_topic(current_query, [next_query] + concepts, researched_topics, [short_filename])
         if not next_query:
-            print("No new topics to research. Generating a new topic...")
-            new_topic_prompt = f"Suggest a related but different topic to '{current_query}' that hasn't been researched yet. Keep it under 20 characters."
-            next_query = chat_with_llm(new_topic_prompt).strip()[:20]
-
-        # Ensure the new topic hasn't been researched (case-insensitive)
-        while next_query.lower() in researched_topics:
-            print(f"'{next_query}' has already been researched. Generating a new topic...")
-            new_topic_prompt = f"Suggest a different topic related to '{current_query}' that hasn't been researched yet. Keep it under 20 characters."
-            next_query = chat_with_llm(new_topic_prompt).strip()[:20]
+            print("No new topics to research.")
+            break
 
         print(f"Next research topic: {next_query}")
 
         if not auto_continue:
+            # Kullanıcı karar verirken olası sonraki konuların kaynaklarını topla
+            if PREFETCH_ENABLED:
+                prefetcher.prefetch([next_query] + [c for c in concepts if c.lower() not in researched_topics])
             user_input = input("Do you want to continue with the next topic? (y/n): ").lower()
+            prefetcher.cancel(keep=[next_query] if user_input == 'y' else [])
             if user_input != 'y':
                 break
 
+        completed_query = current_query
         current_query = next_query
         iteration += 1
-        save_checkpoint(current_query, iteration, researched_topics, auto_continue, max_iterations)
+        save_checkpoint(current_query, iteration, auto_continue, max_iterations)
+        journal.complete(completed_query)
 
     print("Research process completed.")
+    prefetcher.shutdown()
+    update_backlinks()
+    print_run_stats()
     if os.path.exists(CHECKPOINT_FILE):
         os.remove(CHECKPOINT_FILE)
+    journal.clear()
+
+def print_run_stats():
+    if http_stats:
+        print(format_http_stats())
+    print(f"LLM cache: {llm_cache.stats()}")
+    print(f"Embedding cache: {embedding_cache.stats()}")
+    print(f"Source cache: {format_source_cache_stats()}")
+    print(f"Ollama scheduler: {ollama_scheduler.format_stats()}")
+    print(f"Prefetch: {prefetcher.format_stats()}")
+    metrics.write_prometheus()
+
+class JobQueue:
+    # SQLite iş kuyruğu; her iş bir başlangıç konusundan başlayan araştırma zinciridir
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, seed TEXT, status TEXT, iterations INTEGER,
+            completed INTEGER DEFAULT 0, current_topic TEXT, attempts INTEGER DEFAULT 0,
+            error TEXT, created TEXT, updated TEXT)""")
+        self.conn.commit()
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+            self.conn.commit()
+            return rows
+
+    def enqueue(self, seeds, iterations):
+        added = 0
+        now = datetime.now().isoformat()
+        for seed in seeds:
+            # Aynı konu için bekleyen bir iş varsa tekrar ekleme
+            if not self.execute("SELECT 1 FROM jobs WHERE lower(seed) = lower(?) AND status IN ('pending', 'running')", (seed,)):
+                self.execute("INSERT INTO jobs (seed, status, iterations, created, updated) VALUES (?, 'pending', ?, ?, ?)",
+                             (seed, iterations, now, now))
+                added += 1
+        return added
+
+    def recover(self):
+        # Önceki çalıştırma kesildiyse yarım kalan işler yeniden kuyruğa alınır
+        self.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+
+    def claim(self):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ?", (datetime.now().isoformat(), row["id"]))
+            self.conn.commit()
+            return dict(row)
+
+    def progress(self, job_id, current_topic, completed):
+        self.execute("UPDATE jobs SET current_topic = ?, completed = ?, updated = ? WHERE id = ?",
+                     (current_topic, completed, datetime.now().isoformat(), job_id))
+
+    def finish(self, job_id, status, error=None):
+        self.execute("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?",
+                     (status, error, datetime.now().isoformat(), job_id))
+
+    def fail(self, job_id, error):
+        self.execute("UPDATE jobs SET attempts = attempts + 1 WHERE id = ?", (job_id,))
+        attempts = self.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,))[0][0]
+        self.finish(job_id, "pending" if attempts < JOB_MAX_ATTEMPTS else "failed", error)
+
+    def summary(self):
+        return self.execute("SELECT id, seed, status, completed, iterations, current_topic, attempts, error FROM jobs ORDER BY id")
+
+batch_stop = threading.Event()
+claimed_topics = set()
+claimed_topics_lock = threading.Lock()
+
+def claim_topic(topic):
+    with claimed_topics_lock:
+        if topic.lower() in claimed_topics or topic.lower() in topic_index:
+            return False
+        claimed_topics.add(topic.lower())
+        return True
+
+def release_topic(topic):
+    with claimed_topics_lock:
+        claimed_topics.discard(topic.lower())
+
+class UnavailableTopics:
+    # Yenilik filtresi için: araştırılmış ya da şu anda başka bir işte araştırılan konular
+    def __contains__(self, key):
+        with claimed_topics_lock:
+            if key.lower() in claimed_topics:
+                return True
+        return key in topic_index
+
+unavailable_topics = UnavailableTopics()
+
+def run_job(queue, job):
+    topic = job["current_topic"] or job["seed"]
+    completed = job["completed"]
+    reselections = 0
+    try:
+        while topic and completed < job["iterations"] and not batch_stop.is_set():
+            if not claim_topic(topic):
+                # Konu başka bir iş tarafından araştırıldı ya da araştırılıyor
+                if reselections >= JOB_MAX_RESELECTIONS:
+                    print(f"[job {job['id']}] {reselections} yeni konu denendi, hepsi alınmış. İş bitiriliyor.")
+                    break
+                reselections += 1
+                print(f"[job {job['id']}] '{topic}' daha önce araştırılmış. Yeni bir konu öneriliyor...")
+                topic = select_next_topic(topic, [], unavailable_topics)
+                continue
+            reselections = 0
+            try:
+                print(f"\n[job {job['id']}] İterasyon {completed + 1}/{job['iterations']}: '{topic}' araştırılıyor")
+                short_filename, concepts, selected_concept = research_and_expand(topic)
+                topic_index[topic] = short_filename
+            finally:
+                release_topic(topic)
+            next_topic = select_next_topic(topic, [selected_concept] + concepts, unavailable_topics, [short_filename])
+            completed += 1
+            queue.progress(job["id"], next_topic, completed)
+            journal.complete(topic)
+            topic = next_topic
+        # Durdurulan işler bekleyen duruma döner ve sonraki çalıştırmada kaldığı yerden devam eder
+        queue.finish(job["id"], "pending" if batch_stop.is_set() and topic and completed < job["iterations"] else "done")
+    except Exception as e:
+        print(f"[job {job['id']}] Error: {str(e)}")
+        queue.fail(job["id"], str(e))
+
+def batch_worker(queue):
+    while not batch_stop.is_set():
+        job = queue.claim()
+        if job is None:
+            return
+        run_job(queue, job)
+
+def batch_signal_handler(sig, frame):
+    if batch_stop.is_set():
+        # sys.exit çalışan işi ve iş parçacıklarını beklerdi; zorla çıkışta hemen sonlan
+        os._exit(1)
+    print("\nDurdurma isteği alındı; çalışan konular tamamlanınca çıkılacak (zorla çıkmak için tekrar basın).")
+    batch_stop.set()
+
+def run_batch(queue, concurrency=BATCH_CONCURRENCY):
+    signal.signal(signal.SIGINT, batch_signal_handler)
+    signal.signal(signal.SIGTERM, batch_signal_handler)
+    queue.recover()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for worker in [executor.submit(batch_worker, queue) for _ in range(concurrency)]:
+            worker.result()
+    print_job_summary(queue)
+    update_backlinks()
+    print_run_stats()
+
+def print_job_summary(queue):
+    for job in queue.summary():
+        line = f"#{job['id']} [{job['status']}] {job['seed']}: {job['completed']}/{job['iterations']}"
+        if job['error']:
+            line += f" (attempts: {job['attempts']}, last error: {job['error']})"
+        print(line)
+
+def read_seeds(path):
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def parse_note(path):
+    # created/tags/links satırları, "aliases:" bloğu ve "# başlık" satırı; gövde başlıktan itibaren indekslenir
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    note_id = os.path.splitext(os.path.basename(path))[0]
+    note = {"id": note_id, "query": note_id, "created": "", "tags": [], "links": [], "aliases": [], "body": text}
+    lines = text.split("\n")
+    in_aliases = False
+    for index, line in enumerate(lines):
+        if line.startswith("# "):
+            note["query"] = line[2:].strip()
+            note["body"] = "\n".join(lines[index:])
+            break
+        if in_aliases and line.strip().startswith("- "):
+            note["aliases"].append(line.strip()[2:].strip())
+            continue
+        in_aliases = line.strip() == "aliases:"
+        if line.startswith("created:"):
+            note["created"] = line[len("created:"):].strip()
+        elif line.startswith("tags:"):
+            note["tags"] = re.findall(r'#([^\s#]+)', line)
+        elif line.startswith("links:"):
+            note["links"] = re.findall(r'\[\[([^\]|]+)', line)
+    return note
+
+def note_hash(path):
+    # Model ve parça ayarları da özete girer; değişirlerse tüm notlar yeniden gömülür
+    with open(path, "rb") as f:
+        return cache_key(EMBEDDING_MODEL, INDEX_CHUNK_TOKENS, INDEX_CHUNK_OVERLAP_TOKENS, hashlib.sha256(f.read()).hexdigest())
+
+def indexed_notes(collection):
+    # Not başına saklı içerik özeti ve parça id'leri; metadata sayfa sayfa okunur
+    notes = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=REINDEX_PAGE_SIZE, offset=offset)
+        for id_, metadata in zip(page["ids"], page["metadatas"] or []):
+            entry = notes.setdefault(metadata.get("parent", id_), {"hash": None, "ids": []})
+            entry["ids"].append(id_)
+            entry["hash"] = metadata.get("content_hash", entry["hash"])
+        if len(page["ids"]) < REINDEX_PAGE_SIZE:
+            break
+        offset += REINDEX_PAGE_SIZE
+    return notes
+
+def reindex_batch(collection, batch, indexed):
+    notes = []
+    for path, content_hash in batch:
+        note = parse_note(path)
+        topic_index[note["query"]] = note["id"]
+        notes.append((note["id"], note["body"], {
+            "filename": note["id"],
+            "query": note["query"],
+            "created": note["created"],
+            "aliases": ", ".join(note["aliases"]),
+            "tags": ", ".join(note["tags"]),
+            "links": ", ".join(note["links"]),
+            "content_hash": content_hash
+        }))
+    index_notes(collection, notes, upsert=True, remember=False)
+    # Kısalan notların artık parçaları ve parçalanmadan önceki tek vektörlü kayıtlar silinir
+    stale = []
+    for note_id, body, _ in notes:
+        current = {f"{note_id}#{i}" for i in range(len(chunk_note(body)))}
+        stale += [id_ for id_ in indexed.get(note_id, {"ids": []})["ids"] if id_ not in current]
+    if stale:
+        collection.delete(ids=stale)
+    return len(notes)
+
+def reindex_vault(folder="obsidian", workers=REINDEX_WORKERS, batch_size=REINDEX_BATCH_NOTES):
+    collection = get_collection()
+    paths = sorted(entry.path for entry in os.scandir(folder) if entry.is_file() and entry.name.endswith(".md"))
+    indexed = indexed_notes(collection)
+    changed = []
+    for path in paths:
+        content_hash = note_hash(path)
+        if indexed.get(os.path.splitext(os.path.basename(path))[0], {}).get("hash") != content_hash:
+            changed.append((path, content_hash))
+    print(f"{len(paths)} note(s) in {folder}, {len(paths) - len(changed)} unchanged, {len(changed)} to index.")
+
+    # Her grup kendi parçalarını toplu gömer ve tek upsert ile yazar; bellekte yalnızca çalışan gruplar tutulur
+    batches = [changed[start:start + batch_size] for start in range(0, len(changed), batch_size)]
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for count in executor.map(lambda batch: reindex_batch(collection, batch, indexed), batches):
+            done += count
+            print(f"Indexed {done}/{len(changed)} note(s)")
+    return done
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CogniChain research assistant")
+    parser.add_argument("--batch", metavar="FILE", nargs="?", const="",
+                        help="run headless: queue seed topics from FILE ('-' for stdin), then process the job queue")
+    parser.add_argument("--status", action="store_true", help="show the job queue and exit")
+    parser.add_argument("--queue", default=JOB_QUEUE_FILE, help="job queue database")
+    parser.add_argument("--iterations", type=int, default=BATCH_ITERATIONS, help="notes per seed topic")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="jobs processed in parallel")
+    parser.add_argument("--reindex", metavar="FOLDER", nargs="?", const="obsidian",
+                        help="rebuild the vector index from the notes in FOLDER (default: obsidian) and exit")
+    parser.add_argument("--relink", action="store_true", help="add links between notes created since the last pass and exit")
+    parser.add_argument("--offline", action="store_true", help="serve sources only from the response cache")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    SOURCE_OFFLINE = args.offline
+    if args.status:
+        print_job_summary(JobQueue(args.queue))
+    elif args.reindex is not None:
+        reindex_vault(args.reindex)
+        print_run_stats()
+    elif args.relink:
+        update_backlinks()
+    elif args.batch is not None:
+        queue = JobQueue(args.queue)
+        if args.batch:
+            print(f"{queue.enqueue(read_seeds(args.batch), args.iterations)} job(s) queued.")
+        run_batch(queue, args.concurrency)
+    else:
+        main()